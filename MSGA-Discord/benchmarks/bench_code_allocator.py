@@ -0,0 +1,65 @@
+"""Benchmark the verification code allocator against a growing set of live codes.
+
+    python benchmarks/bench_code_allocator.py --length 6 --sizes 1000 10000 100000 500000 900000
+
+For each size the allocator is filled with that many live codes, then a fixed number of
+codes is allocated and released again. The cost per allocation should stay flat.
+
+The churn case then keeps a small number of codes live while issuing and releasing many
+more, as a long-running bot does. The allocator's maps should stay bounded by the live
+codes however many cycles run.
+"""
+import argparse
+import os
+import sys
+import time
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot import CodeAllocator
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CodeAllocator allocation cost")
+    parser.add_argument("--length", type=int, default=6, help="Code length in digits")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 500000, 900000],
+                        help="Numbers of live codes to measure at")
+    parser.add_argument("--samples", type=int, default=20000, help="Allocations measured per size")
+    parser.add_argument("--churn-live", type=int, default=100, help="Live codes kept during the churn case")
+    parser.add_argument("--churn-cycles", type=int, default=1000000, help="Issue/release cycles in the churn case")
+    args = parser.parse_args()
+
+    allocator = CodeAllocator(args.length)
+    live = []
+    for size in args.sizes:
+        while len(live) < size:
+            live.append(allocator.allocate())
+
+        start = time.perf_counter()
+        codes = [allocator.allocate() for _ in range(args.samples)]
+        elapsed = time.perf_counter() - start
+        assert None not in codes and not set(codes) & set(live), "allocator returned a live code"
+        for code in codes:
+            allocator.release(code)
+
+        print(f"📊 {size:>9} live codes: {elapsed / args.samples * 1e6:.2f} µs per allocation")
+
+    churn(args)
+
+def churn(args):
+    """Issue and release codes with only a few live at a time, the maps must not grow with the cycles"""
+    allocator = CodeAllocator(args.length)
+    live = deque(allocator.allocate() for _ in range(args.churn_live))
+    start = time.perf_counter()
+    for cycle in range(1, args.churn_cycles + 1):
+        allocator.release(live.popleft())
+        live.append(allocator.allocate())
+        if cycle % (args.churn_cycles // 4 or 1) == 0:
+            entries = len(allocator.slots) + len(allocator.positions)
+            print(f"📊 churn after {cycle:>9} cycles: {entries} map entries for {len(live)} live codes")
+            assert entries <= 2 * len(live), "allocator memory grows with the codes issued"
+    elapsed = time.perf_counter() - start
+    print(f"📊 churn: {elapsed / args.churn_cycles * 1e6:.2f} µs per issue/release cycle")
+
+if __name__ == "__main__":
+    main()
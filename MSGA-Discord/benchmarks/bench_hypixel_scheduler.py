@@ -0,0 +1,98 @@
+"""Check that the Hypixel scheduler keeps to the API key's quota under a burst of lookups.
+
+    python benchmarks/bench_hypixel_scheduler.py --limit 5 --window 2 --lookups 20
+
+A local stand-in for the Hypixel API counts requests in fixed windows, answers with the
+RateLimit-* headers and returns 429 once a window's quota is used up. The scheduler should
+never send more than --limit requests in a window, so no 429 should come back.
+"""
+import argparse
+import asyncio
+import math
+import os
+import sys
+import tempfile
+import time
+
+from aiohttp import web
+
+BOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class QuotaStandIn:
+    """Hypixel /player stand-in with a fixed-window quota, records requests per window"""
+    def __init__(self, limit: int, window: float, latency: float):
+        self.limit = limit
+        self.window = window
+        self.latency = latency
+        self.window_start = None
+        self.windows = []  # requests seen in each window, in order
+        self.rate_limited = 0
+
+    async def player(self, request):
+        now = time.monotonic()
+        if self.window_start is None or now >= self.window_start + self.window:
+            self.window_start = now
+            self.windows.append(0)
+        self.windows[-1] += 1
+        used = self.windows[-1]
+        headers = {
+            "RateLimit-Limit": str(self.limit),
+            "RateLimit-Remaining": str(max(0, self.limit - used)),
+            "RateLimit-Reset": str(math.ceil(self.window_start + self.window - now))
+        }
+        await asyncio.sleep(self.latency)
+        if used > self.limit:
+            self.rate_limited += 1
+            return web.json_response({"success": False, "cause": "Key throttle"}, status=429, headers=headers)
+        return web.json_response({"success": True, "player": None}, headers=headers)
+
+    async def start(self) -> int:
+        app = web.Application()
+        app.router.add_get("/player", self.player)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        return site._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+async def run(args) -> QuotaStandIn:
+    standin = QuotaStandIn(args.limit, args.window, args.latency)
+    port = await standin.start()
+    os.environ.update({
+        "HYPIXEL_API_URL": f"http://127.0.0.1:{port}",
+        "HYPIXEL_API_KEY": "bench",
+        "HYPIXEL_RATE_LIMIT": str(args.limit),
+        "HYPIXEL_RATE_WINDOW": str(args.window),
+        "VERIFICATION_FILE_PATH": os.path.join(tempfile.mkdtemp(prefix="msga-bench-"), "verification_codes.json"),
+        "TENANTS_PATH": ""
+    })
+    sys.path.insert(0, BOT_DIR)
+    import bot
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(bot.hypixel_scheduler.get("player", {"uuid": str(i)}) for i in range(args.lookups)))
+    elapsed = time.perf_counter() - started
+    assert all(status == 200 for status, _ in results), "a lookup did not succeed"
+    await bot.close_http_session()
+    await standin.stop()
+
+    print(f"📊 {args.lookups} lookups in {elapsed:.1f}s, requests per window: {standin.windows}, 429s: {standin.rate_limited}")
+    return standin
+
+def main():
+    parser = argparse.ArgumentParser(description="Check HypixelScheduler against a fixed-window quota")
+    parser.add_argument("--limit", type=int, default=5, help="Requests allowed per window")
+    parser.add_argument("--window", type=float, default=2, help="Window length in seconds")
+    parser.add_argument("--lookups", type=int, default=20, help="Lookups started at once")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds per stand-in response")
+    args = parser.parse_args()
+
+    standin = asyncio.run(run(args))
+    assert max(standin.windows) <= args.limit, f"more than {args.limit} requests went out in one window"
+    assert not standin.rate_limited, "the scheduler ran into the quota"
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Check that a journal-mode store comes back from a crash with the right codes.
+
+    python benchmarks/bench_journal_replay.py
+
+Each case writes a verification file and journal as a crash could leave them, opens a
+store in journal mode over them and checks what it replayed:
+
+- torn: the last journal line was cut off mid-write, the lines before it still count
+- newer snapshot: a compaction wrote the file but died before dropping the set-aside
+  journal, and the plugin has verified a code since. Replaying must not undo that.
+- del then put: a code was removed and issued again, a later verified flip by the
+  plugin must still be picked up from the file
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("TENANTS_PATH", "")
+os.environ.setdefault("VERIFICATION_STORAGE_MODE", "journal")
+
+import bot
+
+def entry(user_id: str, **fields) -> dict:
+    return {"discord_user_id": user_id, "timestamp": int(time.time()), "verified": False, **fields}
+
+def write_file(path: str, data: dict):
+    # Renamed over the old file like the plugin does, so the store sees a new inode
+    with open(path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+def write_journal(path: str, records: list, torn: str = ""):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("".join(json.dumps(record, separators=(",", ":")) + "\n" for record in records) + torn)
+
+async def open_store(workdir: str, snapshot: dict, journal: list = (), old_journal: list = (), torn: str = ""):
+    path = os.path.join(workdir, "verification_codes.json")
+    write_file(path, snapshot)
+    if journal or torn:
+        write_journal(path + ".journal", journal, torn)
+    if old_journal:
+        write_journal(path + ".journal.old", old_journal)
+    store = bot.VerificationStore(path, mode="journal")
+    await store.refresh()
+    return store
+
+async def torn(workdir: str):
+    store = await open_store(
+        workdir,
+        {"100001": entry("1")},
+        journal=[{"op": "put", "code": "100002", "entry": entry("2")}],
+        torn='{"op":"put","code":"100003","entry":{"discord_us'
+    )
+    assert await store.contains("100001"), "a code from the file was lost"
+    assert await store.contains("100002"), "a journal record before the torn line was lost"
+    assert not await store.contains("100003"), "the torn line was replayed"
+    await store.close()
+
+async def newer_snapshot(workdir: str):
+    # The set-aside journal ends with the state the snapshot was written with, the plugin
+    # verified 100001 after that
+    store = await open_store(
+        workdir,
+        {"100001": entry("1", verified=True), "100002": entry("2")},
+        old_journal=[
+            {"op": "put", "code": "100001", "entry": entry("1")},
+            {"op": "put", "code": "100003", "entry": entry("3")},
+            {"op": "del", "code": "100003"}
+        ],
+        journal=[{"op": "put", "code": "100002", "entry": entry("2", note="after the compaction")}]
+    )
+    assert (await store.get("100001"))["verified"], "replaying the set-aside journal undid the plugin's verification"
+    assert (await store.get("100002")).get("note") == "after the compaction", "the live journal was not replayed"
+    assert not await store.contains("100003"), "a code removed before the compaction came back"
+    assert len(store) == 2
+    await store.close()
+
+async def del_then_put(workdir: str):
+    store = await open_store(
+        workdir,
+        {"100001": entry("1")},
+        journal=[
+            {"op": "del", "code": "100001"},
+            {"op": "put", "code": "100001", "entry": entry("2")}
+        ]
+    )
+    assert (await store.get("100001"))["discord_user_id"] == "2", "the code issued again was not replayed"
+    assert "100001" not in store.removed, "the code issued again is still marked removed"
+    assert await store.active_code_for_user("2") == "100001"
+
+    # The plugin verifies the code in the file it reads
+    await store.compact()
+    write_file(store.path, {"100001": entry("2", verified=True)})
+    await store.refresh()
+    assert (await store.get("100001"))["verified"], "the plugin's verification of the code issued again was ignored"
+    await store.close()
+
+async def run():
+    for case in (torn, newer_snapshot, del_then_put):
+        with tempfile.TemporaryDirectory(prefix="msga-bench-") as workdir:
+            await case(workdir)
+        print(f"✅ {case.__name__.replace('_', ' ')}")
+    bot.file_io.shutdown()
+
+def main():
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,532 @@
+"""End-to-end benchmark of the verification pipeline without any live service.
+
+    python benchmarks/bench_pipeline.py --sizes 1000 10000 100000 1000000 --output results.json
+
+Each size runs in its own process with a synthetic verification_codes.json of that many
+entries. Local aiohttp servers stand in for the Mojang and Hypixel APIs (with configurable
+latency, error rate and 429s), a thread plays the Minecraft plugin by flipping
+`verified: true` in the file at a fixed rate, and a fake guild records role grants and
+DMs. The harness drives the verification loop and the slash command handlers, then reports
+throughput, p50/p99 latency, event loop lag and memory as JSON so runs can be compared
+across versions.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import queue
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from aiohttp import web
+
+BOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HYPIXEL_GUILD_ID = "5f0000000000000000000000"
+DISCORD_GUILD_ID = 1
+VERIFIED_ROLE_ID = 2
+LOOP_LAG_INTERVAL = 0.01
+
+def percentile(values: list, fraction: float):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def summarize(values: list) -> dict:
+    return {
+        "count": len(values),
+        "p50": percentile(values, 0.50),
+        "p99": percentile(values, 0.99),
+        "max": max(values) if values else None
+    }
+
+def player_uuid(name: str) -> str:
+    return hashlib.md5(name.lower().encode()).hexdigest()
+
+def rss_kb() -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+# ==================== SYNTHETIC DATA ====================
+def code_length(size: int) -> int:
+    """Digits per code, at least 6 and leaving at least half the code space free for /verify"""
+    return max(6, len(str(2 * size - 1)))
+
+def generate_codes(path: str, size: int, in_guild_rate: float) -> list:
+    """Write a verification file with `size` entries, returns the pending codes"""
+    length = code_length(size)
+    now = int(time.time())
+    data = {}
+    pending = []
+    for i in range(size):
+        code = str(i).zfill(length)
+        kind = i % 4
+        entry = {
+            "minecraft_username": f"player{i}" if random.random() < in_guild_rate else f"outsider{i}",
+            "timestamp": now,
+            "verified": kind >= 2,
+            "discord_user_id": str(1000 + i),
+            "processed": kind >= 2,
+            "created_at": "2024-01-01T00:00:00+00:00"
+        }
+        if kind == 2:
+            entry.update(guild_verified=True, verified_at="2024-01-01T00:00:00+00:00", guild_name="Bench")
+        elif kind == 3:
+            entry.update(guild_verified=False, error="Player is not in any guild")
+        else:
+            # Half the file is pending, nothing is submitted until the simulated plugin starts
+            pending.append(code)
+        data[code] = entry
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+    return pending
+
+class PluginSimulator(multiprocessing.Process):
+    """Flips `verified: true` the way the plugin does: read the whole file, rewrite it in place.
+
+    Runs in its own process like the real plugin, so its JSON work doesn't compete with the
+    bot for the GIL. Flip times are sent back through a queue.
+    """
+    def __init__(self, path: str, codes: list, rate: float):
+        super().__init__(daemon=True)
+        self.path = path
+        self.codes = codes
+        self.rate = rate
+        self.flips = multiprocessing.Queue()  # (code, time the plugin wrote it)
+        self.stop_event = multiprocessing.Event()
+        self.flipped_at = {}
+
+    def run(self):
+        start_time = time.time()
+        remaining = list(self.codes)
+        flipped = []
+        interval = 0.1
+        while not self.stop_event.is_set():
+            started = time.time()
+            due = int((started - start_time) * self.rate) - len(flipped)
+            batch = [remaining.pop() for _ in range(min(due, len(remaining)))]
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                remaining.extend(batch)
+                self.stop_event.wait(interval)
+                continue
+            changed = False
+            # Re-apply earlier flips a bot save raced over, the player would simply retry
+            for code in batch + flipped:
+                entry = data.get(code)
+                if entry is not None and not entry.get("verified"):
+                    entry["verified"] = True
+                    changed = True
+            if changed:
+                with open(self.path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, indent=2)
+            now = time.time()
+            for code in batch:
+                self.flips.put((code, now))
+            flipped.extend(batch)
+            self.stop_event.wait(max(0.0, interval - (time.time() - started)))
+
+    def collect(self) -> dict:
+        """Flip times reported so far, code -> time"""
+        while True:
+            try:
+                code, flipped_at = self.flips.get_nowait()
+            except queue.Empty:
+                return self.flipped_at
+            self.flipped_at[code] = flipped_at
+
+# ==================== API STAND-INS ====================
+class UpstreamStandIns:
+    def __init__(self, latency: float, error_rate: float, rate_limit_rate: float, in_guild_roster: int):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.in_guild_roster = in_guild_roster
+        self.requests = {}
+        self.runner = None
+
+    def _count(self, name: str):
+        self.requests[name] = self.requests.get(name, 0) + 1
+
+    async def _misbehave(self, name: str):
+        """Sleep for the configured latency, then maybe return an error or a 429"""
+        self._count(name)
+        if self.latency:
+            await asyncio.sleep(random.expovariate(1 / self.latency))
+        roll = random.random()
+        if roll < self.rate_limit_rate:
+            self._count(f"{name}_429")
+            return web.json_response({"success": False, "cause": "Key throttle"}, status=429, headers={"Retry-After": "1"})
+        if roll < self.rate_limit_rate + self.error_rate:
+            self._count(f"{name}_error")
+            return web.json_response({"success": False}, status=503)
+        return None
+
+    async def mojang_profile(self, request):
+        error = await self._misbehave("mojang")
+        if error:
+            return error
+        name = request.match_info["name"]
+        return web.json_response({"id": player_uuid(name), "name": name})
+
+    async def mojang_bulk(self, request):
+        error = await self._misbehave("mojang_bulk")
+        if error:
+            return error
+        names = await request.json()
+        return web.json_response([{"id": player_uuid(name), "name": name} for name in names])
+
+    async def hypixel_guild(self, request):
+        error = await self._misbehave("hypixel")
+        if error:
+            return error
+        headers = {"RateLimit-Limit": "300", "RateLimit-Remaining": "299", "RateLimit-Reset": "300"}
+        if "id" in request.query:
+            members = [{"uuid": player_uuid(f"player{i}")} for i in range(self.in_guild_roster)]
+            guild = {"_id": HYPIXEL_GUILD_ID, "name": "Bench", "members": members}
+        elif request.query.get("player") in self.members:
+            guild = {"_id": HYPIXEL_GUILD_ID, "name": "Bench"}
+        else:
+            # "outsider" names aren't in any guild
+            guild = None
+        return web.json_response({"success": True, "guild": guild}, headers=headers)
+
+    async def start(self, members: set) -> int:
+        self.members = members
+        app = web.Application()
+        app.router.add_get("/users/profiles/minecraft/{name}", self.mojang_profile)
+        app.router.add_post("/minecraft/profile/lookup/bulk/byname", self.mojang_bulk)
+        app.router.add_get("/guild", self.hypixel_guild)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        return site._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+# ==================== FAKE DISCORD ====================
+class FakeRole:
+    def __init__(self, role_id: int):
+        self.id = role_id
+        self.name = "Verified"
+        self.mention = f"<@&{role_id}>"
+
+class FakeMember:
+    def __init__(self, guild, member_id: int):
+        self.guild = guild
+        self.id = member_id
+        self.name = f"member{member_id}"
+        self.display_name = self.name
+        self.mention = f"<@{member_id}>"
+        self.roles = []
+
+    async def add_roles(self, *roles, **kwargs):
+        await asyncio.sleep(self.guild.latency)
+        self.roles.extend(role for role in roles if role not in self.roles)
+        self.guild.role_grants[str(self.id)] = time.time()
+
+    async def remove_roles(self, *roles, **kwargs):
+        await asyncio.sleep(self.guild.latency)
+        self.roles = [role for role in self.roles if role not in roles]
+
+    async def send(self, *args, **kwargs):
+        await asyncio.sleep(self.guild.latency)
+        self.guild.dms += 1
+
+class FakeGuild:
+    """Every user id is a member, role grants and DMs are recorded"""
+    def __init__(self, latency: float):
+        self.id = DISCORD_GUILD_ID
+        self.name = "Bench Guild"
+        self.latency = latency
+        self.members = {}
+        self.role = FakeRole(VERIFIED_ROLE_ID)
+        self.role_grants = {}  # discord user id -> time the role was added
+        self.dms = 0
+
+    def get_member(self, member_id: int):
+        member = self.members.get(member_id)
+        if member is None:
+            member = self.members[member_id] = FakeMember(self, member_id)
+        return member
+
+    async def fetch_member(self, member_id: int):
+        await asyncio.sleep(self.latency)
+        return self.get_member(member_id)
+
+    async def query_members(self, user_ids=None, limit=5, **kwargs):
+        await asyncio.sleep(self.latency)
+        return [self.get_member(user_id) for user_id in user_ids or ()]
+
+    def get_role(self, role_id: int):
+        return self.role if role_id == self.role.id else None
+
+class FakeUser:
+    def __init__(self, user_id: int):
+        self.id = user_id
+        self.name = f"user{user_id}"
+
+class FakeResponse:
+    async def defer(self, **kwargs):
+        pass
+
+    async def send_message(self, *args, **kwargs):
+        pass
+
+    async def edit_message(self, *args, **kwargs):
+        pass
+
+class FakeFollowup:
+    async def send(self, *args, **kwargs):
+        pass
+
+class FakeInteraction:
+    def __init__(self, user_id: int):
+        self.user = FakeUser(user_id)
+        self.guild_id = DISCORD_GUILD_ID
+        self.response = FakeResponse()
+        self.followup = FakeFollowup()
+
+# ==================== RUN ====================
+async def time_command(command, samples: int, make_args) -> dict:
+    latencies = []
+    for i in range(samples):
+        started = time.perf_counter()
+        await command.callback(*make_args(i))
+        latencies.append(time.perf_counter() - started)
+    return summarize(latencies)
+
+async def sample_loop_lag(lags: list):
+    """Record how late the event loop wakes up for a short timer, i.e. how long it was blocked"""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        lags.append(max(0.0, loop.time() - started - LOOP_LAG_INTERVAL))
+
+async def run_size(args) -> dict:
+    workdir = tempfile.mkdtemp(prefix="msga-bench-")
+    path = os.path.join(workdir, "verification_codes.json")
+    pending = generate_codes(path, args.run_one, args.in_guild_rate)
+    submissions = random.sample(pending, min(args.submissions, len(pending)))
+    file_bytes = os.path.getsize(path)
+
+    standins = UpstreamStandIns(args.latency, args.error_rate, args.rate_limit_rate, args.roster_size)
+    port = await standins.start({player_uuid(f"player{i}") for i in range(args.run_one)})
+    os.environ.update({
+        "VERIFICATION_FILE_PATH": path,
+        "VERIFICATION_STORAGE_MODE": args.storage_mode,
+        "VERIFICATION_DB_PATH": os.path.join(workdir, "verification_codes.db"),
+        "VERIFICATION_CODE_LENGTH": str(code_length(args.run_one)),
+        "MOJANG_API_URL": f"http://127.0.0.1:{port}",
+        "MINECRAFT_SERVICES_API_URL": f"http://127.0.0.1:{port}",
+        "HYPIXEL_API_URL": f"http://127.0.0.1:{port}",
+        "HYPIXEL_API_KEY": "bench",
+        "HYPIXEL_GUILD_ID": HYPIXEL_GUILD_ID,
+        "DISCORD_GUILD_ID": str(DISCORD_GUILD_ID),
+        "VERIFIED_ROLE_ID": str(VERIFIED_ROLE_ID),
+        "TENANTS_PATH": "",
+        "DISCORD_ACTION_RETRY_DELAY": "0.1",
+        "RETRY_BASE_DELAY": "0.5"
+    })
+    rss_before = rss_kb()
+    sys.path.insert(0, BOT_DIR)
+    import bot
+    bot.setup_logging()
+    bot.load_tenants()
+
+    guild = FakeGuild(args.discord_latency)
+    bot.bot.get_guild = lambda guild_id: guild if guild_id == DISCORD_GUILD_ID else None
+    tenant = bot.tenants[DISCORD_GUILD_ID]
+    store = tenant.store
+    if args.storage_mode == "sqlite":
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        await store.import_codes(data)
+
+    lags = []
+    lag_task = asyncio.create_task(sample_loop_lag(lags))
+    started = time.perf_counter()
+    await store.refresh()
+    load_seconds = time.perf_counter() - started
+    rss_loaded = rss_kb()
+
+    # Verification loop, the same steps as check_verified_periodically
+    async def verification_loop():
+        tenant.monitor.start()
+        try:
+            while True:
+                await store.refresh()
+                await bot.process_verified_codes(tenant)
+                await tenant.monitor.wait_for_change()
+        finally:
+            tenant.monitor.stop()
+
+    # Codes deferred by a 503 come back through the retry queue, as in retry_deferred_codes_periodically
+    async def retry_loop():
+        while True:
+            tenant.retry_queue.wakeup.clear()
+            next_due = await tenant.retry_queue.release_due()
+            timeout = 60 if next_due is None else max(0.05, next_due - time.time())
+            try:
+                await asyncio.wait_for(tenant.retry_queue.wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    loop_task = asyncio.create_task(verification_loop())
+    retry_task = asyncio.create_task(retry_loop())
+    plugin = PluginSimulator(path, submissions, args.submit_rate)
+    pipeline_started = time.time()
+    plugin.start()
+
+    # Wait for every submitted code to be processed and its role grant and DM to go out
+    async def drained():
+        while sum([((await store.get(code)) or {}).get("processed", False) for code in submissions]) < len(submissions):
+            await asyncio.sleep(0.05)
+        for route in ("roles", "dms"):
+            queue = bot.discord_actions.queues.get(route)
+            if queue is not None:
+                await queue.join()
+    try:
+        await asyncio.wait_for(drained(), timeout=args.timeout)
+    except asyncio.TimeoutError:
+        print(f"⚠️ Timed out after {args.timeout}s waiting for submissions to be processed")
+    pipeline_seconds = time.time() - pipeline_started
+    plugin.stop_event.set()
+    flipped_at = plugin.collect()
+    # The plugin may be in the middle of a rewrite, which must not count as loop lag
+    await asyncio.get_running_loop().run_in_executor(None, plugin.join)
+
+    user_codes = {(await store.get(code))["discord_user_id"]: code for code in submissions}
+    latencies = [
+        granted_at - flipped_at[user_codes[user_id]]
+        for user_id, granted_at in guild.role_grants.items() if user_codes.get(user_id) in flipped_at
+    ]
+    processed = sum([((await store.get(code)) or {}).get("processed", False) for code in submissions])
+
+    commands = {
+        "verify": await time_command(bot.verify_command, args.command_samples, lambda i: (FakeInteraction(10 ** 9 + i), f"newplayer{i}")),
+        "status": await time_command(bot.status_command, args.command_samples, lambda i: (FakeInteraction(1000 + i),)),
+        "list_codes": await time_command(bot.list_codes_command, args.command_samples, lambda i: (FakeInteraction(1), None, None)),
+        "cleanup": await time_command(bot.cleanup_command, min(args.command_samples, 5), lambda i: (FakeInteraction(1),))
+    }
+    # A full code space would only time the "No Codes Available" reply
+    for i in range(args.command_samples):
+        assert await store.active_code_for_user(str(10 ** 9 + i)) is not None, "/verify did not hand out a code"
+
+    for task in (loop_task, retry_task, lag_task):
+        task.cancel()
+    for task in (loop_task, retry_task, lag_task):
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    bot.discord_actions.stop()
+    await bot.close_http_session()
+    await standins.stop()
+    await store.close()
+    bot.file_io.shutdown()
+
+    return {
+        "size": args.run_one,
+        "file_bytes": file_bytes,
+        "storage_mode": args.storage_mode,
+        "load_seconds": load_seconds,
+        "pipeline": {
+            "submissions": len(submissions),
+            "processed": processed,
+            "roles_granted": len(latencies),
+            "seconds": pipeline_seconds,
+            "throughput_per_second": processed / pipeline_seconds if pipeline_seconds else None,
+            "submission_to_role_seconds": summarize(latencies)
+        },
+        "commands": commands,
+        "event_loop_lag_seconds": summarize(lags),
+        "upstream_requests": standins.requests,
+        "memory": {
+            "rss_before_load_kb": rss_before,
+            "rss_after_load_kb": rss_loaded,
+            "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        }
+    }
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BOT_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the verification pipeline")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="Entries in the synthetic file")
+    parser.add_argument("--storage-mode", default="snapshot", choices=["snapshot", "journal", "sqlite"])
+    parser.add_argument("--submissions", type=int, default=200, help="Codes the simulated plugin submits per run")
+    parser.add_argument("--submit-rate", type=float, default=50, help="Submissions per second")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mean Mojang/Hypixel response time in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.01, help="Fraction of API requests answered with 503")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.005, help="Fraction of API requests answered with 429")
+    parser.add_argument("--discord-latency", type=float, default=0.02, help="Seconds per fake Discord call")
+    parser.add_argument("--in-guild-rate", type=float, default=0.9, help="Fraction of players in the Hypixel guild")
+    parser.add_argument("--roster-size", type=int, default=100, help="Members returned by the guild roster endpoint")
+    parser.add_argument("--command-samples", type=int, default=20, help="Invocations measured per slash command")
+    parser.add_argument("--timeout", type=float, default=300, help="Seconds to wait for the submissions to be processed")
+    parser.add_argument("--output", help="Write the JSON results here instead of stdout")
+    parser.add_argument("--verbose", action="store_true", help="Show the bot's own output")
+    parser.add_argument("--run-one", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--result-path", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one is not None:
+        random.seed(args.run_one)
+        result = asyncio.run(run_size(args))
+        with open(args.result_path, 'w', encoding='utf-8') as f:
+            json.dump(result, f)
+        return
+
+    # Each size gets a fresh process, so the bot's module state and memory figures don't carry over
+    results = []
+    for size in args.sizes:
+        with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as result_file:
+            result_path = result_file.name
+        child_args = [arg for arg in sys.argv[1:] if arg not in ("--verbose",)]
+        subprocess.run(
+            [sys.executable, os.path.abspath(__file__), *child_args, "--run-one", str(size), "--result-path", result_path],
+            stdout=None if args.verbose else subprocess.DEVNULL,
+            check=True
+        )
+        with open(result_path, 'r', encoding='utf-8') as f:
+            results.append(json.load(f))
+        os.remove(result_path)
+        print(f"📊 {size} entries: {results[-1]['pipeline']['throughput_per_second']:.1f} codes/s, "
+              f"p99 {results[-1]['pipeline']['submission_to_role_seconds']['p99']}, "
+              f"loop lag max {results[-1]['event_loop_lag_seconds']['max']}", file=sys.stderr)
+
+    report = {
+        "revision": git_revision(),
+        "python": sys.version.split()[0],
+        "parameters": {key: value for key, value in vars(args).items() if key not in ("run_one", "result_path", "output", "verbose")},
+        "results": results
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Check that loading, reloading and saving a large verification file leaves the event loop free.
+
+    python benchmarks/bench_store_lag.py --size 200000 --max-lag 0.1
+
+A synthetic file with --size codes (about 40 MB at the default) is opened in each
+storage mode, then the store goes through a compaction, a reload after the plugin
+verified some codes and, in journal mode, a save. A task samples how late the loop
+wakes up for a short timer during each step. None of them should block the loop for
+longer than --max-lag seconds, however long the step itself takes.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("TENANTS_PATH", "")
+
+import bot
+
+LOOP_LAG_INTERVAL = 0.005
+
+def write_codes(path: str, size: int):
+    now = int(time.time())
+    length = max(6, len(str(size - 1)))
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({
+            str(i).zfill(length): {
+                "discord_user_id": str(10 ** 17 + i),
+                "timestamp": now,
+                "verified": i % 2 == 0,
+                "processed": i % 4 == 0,
+                "minecraft_username": f"player{i}",
+                "guild_verified": i % 8 == 0
+            }
+            for i in range(size)
+        }, f, indent=2)
+
+def verify_in_file(path: str, count: int) -> int:
+    """Flip verified on the first unverified codes like the plugin does, returns how many"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    flipped = 0
+    for entry in data.values():
+        if flipped == count:
+            break
+        if not entry["verified"]:
+            entry["verified"] = True
+            flipped += 1
+    with open(path + ".plugin", 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+    os.replace(path + ".plugin", path)
+    return flipped
+
+async def sample_loop_lag(lags: list):
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        lags.append(max(0.0, loop.time() - started - LOOP_LAG_INTERVAL))
+
+async def measure(results: list, mode: str, step: str, coro):
+    lags = []
+    sampler = asyncio.create_task(sample_loop_lag(lags))
+    await asyncio.sleep(LOOP_LAG_INTERVAL * 2)
+    started = time.perf_counter()
+    await coro
+    elapsed = time.perf_counter() - started
+    sampler.cancel()
+    results.append({"mode": mode, "step": step, "seconds": elapsed, "max_lag": max(lags)})
+    print(f"📊 {mode:8} {step:8} {elapsed:6.2f}s, loop lag max {max(lags) * 1000:.0f} ms")
+
+async def run_mode(args, mode: str, results: list):
+    with tempfile.TemporaryDirectory(prefix="msga-bench-") as workdir:
+        path = os.path.join(workdir, "verification_codes.json")
+        write_codes(path, args.size)
+        store = bot.VerificationStore(path, mode=mode)
+        await measure(results, mode, "load", store.refresh())
+        assert len(store) == args.size
+
+        for code in await store.codes_with_status("verified", limit=args.changes):
+            await store.update(code, note="changed")
+        if mode == "journal":
+            await measure(results, mode, "save", store.save())
+        await measure(results, mode, "compact", store.compact())
+
+        submitted = store.count("submitted")
+        flipped = verify_in_file(path, args.changes)
+        await measure(results, mode, "refresh", store.refresh())
+        assert store.count("submitted") == submitted + flipped, "the plugin's verifications were not picked up"
+        await store.close()
+
+async def run(args) -> list:
+    results = []
+    for mode in ("snapshot", "journal"):
+        await run_mode(args, mode, results)
+    bot.file_io.shutdown()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Check event loop lag while a large verification file is loaded and saved")
+    parser.add_argument("--size", type=int, default=200000, help="Codes in the synthetic file")
+    parser.add_argument("--changes", type=int, default=1000, help="Codes changed by the bot and verified by the plugin")
+    parser.add_argument("--max-lag", type=float, default=0.1, help="Longest the loop may be blocked, in seconds")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    worst = max(results, key=lambda result: result["max_lag"])
+    assert worst["max_lag"] <= args.max_lag, \
+        f"{worst['mode']} {worst['step']} blocked the loop for {worst['max_lag']:.3f}s (limit {args.max_lag}s)"
+
+if __name__ == "__main__":
+    main()
@@ -2,11 +2,31 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 import aiohttp
+from aiohttp import web
 import asyncio
+import atexit
+import bisect
+import copy
+import ctypes
+import ctypes.util
+import hashlib
+import heapq
+import io
+import itertools
 import json
+import logging
+import logging.handlers
 import os
+import queue
 import random
-import string
+import secrets
+import sqlite3
+import stat
+import struct
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from dotenv import load_dotenv
 
@@ -18,7 +38,74 @@ HYPIXEL_API_KEY = os.getenv("HYPIXEL_API_KEY")
 HYPIXEL_GUILD_ID = os.getenv("HYPIXEL_GUILD_ID")  # Hypixel guild MongoDB ID (hex string)
 DISCORD_GUILD_ID = int(os.getenv("DISCORD_GUILD_ID", "0"))  # Discord server ID (numeric)
 VERIFIED_ROLE_ID = int(os.getenv("VERIFIED_ROLE_ID", "0"))
+TENANTS_PATH = os.getenv("TENANTS_PATH", "")  # JSON list of servers to serve, replaces the single-server settings above and below
+DISCORD_SHARDED = os.getenv("DISCORD_SHARDED", "false").lower() == "true"  # Run on AutoShardedBot, for bots in many servers
 VERIFICATION_FILE_PATH = os.getenv("VERIFICATION_FILE_PATH", "/root/verification_codes.json")
+VERIFICATION_STORAGE_MODE = os.getenv("VERIFICATION_STORAGE_MODE", "snapshot").lower()  # snapshot, journal or sqlite
+VERIFICATION_DB_PATH = os.getenv("VERIFICATION_DB_PATH", os.path.splitext(VERIFICATION_FILE_PATH)[0] + ".db")
+VERIFICATION_JOURNAL_PATH = os.getenv("VERIFICATION_JOURNAL_PATH", VERIFICATION_FILE_PATH + ".journal")
+VERIFICATION_COMPACT_DELAY = float(os.getenv("VERIFICATION_COMPACT_DELAY", "1"))  # Seconds before new or removed codes reach the JSON file
+VERIFICATION_COMPACT_RECORDS = int(os.getenv("VERIFICATION_COMPACT_RECORDS", "1000"))  # Journal records that trigger a compaction
+VERIFICATION_COMPACT_INTERVAL = float(os.getenv("VERIFICATION_COMPACT_INTERVAL", "300"))  # Seconds before other journaled changes are compacted
+VERIFICATION_CONTENT_HASH = os.getenv("VERIFICATION_CONTENT_HASH", "false").lower() == "true"  # Also skip reloads when the content is unchanged
+VERIFICATION_BATCH_SIZE = max(1, int(os.getenv("VERIFICATION_BATCH_SIZE", "1000")))  # Codes encoded, merged or scanned at a time, letting the event loop run in between
+VERIFICATION_CODE_TTL = int(os.getenv("VERIFICATION_CODE_TTL", "1800"))  # Seconds before an unsubmitted code expires
+VERIFICATION_RETENTION = int(os.getenv("VERIFICATION_RETENTION", "86400"))  # Seconds submitted and processed codes are kept
+VERIFICATION_ARCHIVE_PATH = os.getenv("VERIFICATION_ARCHIVE_PATH", "")  # Append expired processed codes here (empty to drop them)
+VERIFICATION_CODE_LENGTH = int(os.getenv("VERIFICATION_CODE_LENGTH", "6"))  # Must match the length the plugin accepts
+VERIFICATION_CODE_COOLDOWN = int(os.getenv("VERIFICATION_CODE_COOLDOWN", "0"))  # Seconds before a released code can be issued again
+VERIFICATION_WATCH_MODE = os.getenv("VERIFICATION_WATCH_MODE", "auto").lower()  # auto, inotify or poll
+VERIFICATION_POLL_INTERVAL = float(os.getenv("VERIFICATION_POLL_INTERVAL", "5"))  # Seconds between file checks
+VERIFICATION_WATCH_DEBOUNCE = float(os.getenv("VERIFICATION_WATCH_DEBOUNCE", "0.05"))  # Seconds to let a burst of writes settle
+VERIFICATION_CONCURRENCY = max(1, int(os.getenv("VERIFICATION_CONCURRENCY", "8")))  # Submitted codes processed in parallel
+DISCORD_ACTION_WORKERS = max(1, int(os.getenv("DISCORD_ACTION_WORKERS", "2")))  # Workers per route (role grants, DMs)
+DISCORD_ACTION_MAX_ATTEMPTS = max(1, int(os.getenv("DISCORD_ACTION_MAX_ATTEMPTS", "5")))
+DISCORD_ACTION_RETRY_DELAY = float(os.getenv("DISCORD_ACTION_RETRY_DELAY", "1"))  # Seconds before the first retry, doubled each time
+DISCORD_ACTION_DRAIN_TIMEOUT = float(os.getenv("DISCORD_ACTION_DRAIN_TIMEOUT", "15"))  # Seconds shutdown waits for queued role grants and DMs
+MOJANG_API_URL = os.getenv("MOJANG_API_URL", "https://api.mojang.com").rstrip("/")
+MINECRAFT_SERVICES_API_URL = os.getenv("MINECRAFT_SERVICES_API_URL", "https://api.minecraftservices.com").rstrip("/")
+HYPIXEL_API_URL = os.getenv("HYPIXEL_API_URL", "https://api.hypixel.net").rstrip("/")
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))  # Total seconds per Mojang/Hypixel request
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_POOL_SIZE_PER_HOST = int(os.getenv("HTTP_POOL_SIZE_PER_HOST", "10"))  # Open connections kept per API host
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "30"))  # Seconds an idle connection is kept open
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))
+MOJANG_CACHE_SIZE = int(os.getenv("MOJANG_CACHE_SIZE", "10000"))  # Usernames kept in the UUID cache
+MOJANG_CACHE_TTL = float(os.getenv("MOJANG_CACHE_TTL", "21600"))  # Seconds a resolved username is reused
+MOJANG_NEGATIVE_CACHE_TTL = float(os.getenv("MOJANG_NEGATIVE_CACHE_TTL", "60"))  # Seconds an unknown username is remembered
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))  # Consecutive upstream failures before failing fast
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))  # Seconds before a failing upstream is probed again
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "30"))  # Seconds before the first retry of a deferred code, doubled each time
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "1800"))
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "8"))  # Deferrals before a code fails with the upstream's error
+HYPIXEL_RATE_LIMIT = int(os.getenv("HYPIXEL_RATE_LIMIT", "300"))  # Requests per window until the API reports the real limit
+HYPIXEL_RATE_WINDOW = float(os.getenv("HYPIXEL_RATE_WINDOW", "300"))  # Seconds per window until the API reports when it resets
+GUILD_ROSTER_REFRESH_INTERVAL = float(os.getenv("GUILD_ROSTER_REFRESH_INTERVAL", "300"))  # Seconds between guild roster fetches (0 to disable)
+MOJANG_BATCH_WINDOW = float(os.getenv("MOJANG_BATCH_WINDOW", "0.05"))  # Seconds to collect lookups into one bulk request (0 to disable)
+MOJANG_BATCH_SIZE = min(10, max(1, int(os.getenv("MOJANG_BATCH_SIZE", "10"))))  # Names per bulk request, Mojang allows up to 10
+MOJANG_CACHE_PATH = os.getenv("MOJANG_CACHE_PATH", "")  # Keep the cache across restarts (empty to disable)
+MEMBER_NAME_CACHE_SIZE = int(os.getenv("MEMBER_NAME_CACHE_SIZE", "10000"))  # Discord users kept in the name cache
+MEMBER_NAME_CACHE_TTL = float(os.getenv("MEMBER_NAME_CACHE_TTL", "600"))  # Seconds a resolved member name is reused
+DISCORD_CHUNK_MEMBERS = os.getenv("DISCORD_CHUNK_MEMBERS", "false").lower() == "true"  # Download and cache the whole member list on connect
+MEMBER_CACHE_SIZE = int(os.getenv("MEMBER_CACHE_SIZE", "5000"))  # Members kept when fetched on demand
+MEMBER_CACHE_TTL = float(os.getenv("MEMBER_CACHE_TTL", "300"))  # Seconds a fetched member is reused
+MEMBER_NEGATIVE_CACHE_TTL = float(os.getenv("MEMBER_NEGATIVE_CACHE_TTL", "60"))  # Seconds a user who isn't a member is remembered
+LIST_CODES_PAGE_SIZE = int(os.getenv("LIST_CODES_PAGE_SIZE", "10"))  # Codes per /list_codes page
+ROLE_SWEEP_INTERVAL = float(os.getenv("ROLE_SWEEP_INTERVAL", "3600"))  # Seconds between guild membership sweeps (0 to disable)
+ROLE_SWEEP_RATE = float(os.getenv("ROLE_SWEEP_RATE", "1"))  # Role changes per second during a sweep
+VERIFIED_MEMBERS_PATH = os.getenv("VERIFIED_MEMBERS_PATH", os.path.splitext(VERIFICATION_FILE_PATH)[0] + "_members.json")
+COMMAND_SYNC_STATE_PATH = os.getenv("COMMAND_SYNC_STATE_PATH", os.path.splitext(VERIFICATION_FILE_PATH)[0] + "_commands.sha256")  # Delete to force a sync
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", "0.5"))  # Seconds between event loop lag samples
+PUSH_SECRET = os.getenv("PUSH_SECRET", "")  # Shared secret the plugin sends in the X-MSGA-Secret header (required to enable push)
+PUSH_SOCKET_PATH = os.getenv("PUSH_SOCKET_PATH", "")  # Unix socket for plugin events, used instead of PUSH_PORT when set
+PUSH_HOST = os.getenv("PUSH_HOST", "127.0.0.1")
+PUSH_PORT = int(os.getenv("PUSH_PORT", "0"))  # Loopback port for plugin events (0 to disable)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()  # text or json (one object per line)
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1"))  # Fraction of chatty per-tick lines (reloads, saves) kept
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))  # Records waiting to be written, further records are dropped
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # Port for the Prometheus /metrics endpoint (0 to disable)
 
 # Bot setup with intents
 intents = discord.Intents.default()
@@ -26,289 +113,3240 @@ intents.message_content = True
 intents.members = True
 intents.guilds = True
 
-bot = commands.Bot(command_prefix="!", intents=intents)
+class VerificationBot(commands.AutoShardedBot if DISCORD_SHARDED else commands.Bot):
+    async def setup_hook(self):
+        if MOJANG_CACHE_PATH:
+            await mojang_cache.load(MOJANG_CACHE_PATH)
+        if METRICS_PORT:
+            await start_metrics_server()
+        
+        # setup_hook runs once per process, unlike on_ready which fires again on every reconnect
+        self.loop.create_task(monitor_loop_lag())
+        for tenant in tenants.values():
+            await tenant.verified_members.load()
+            await load_verification_state(tenant)
+            self.loop.create_task(check_verified_periodically(tenant))
+            self.loop.create_task(expire_codes_periodically(tenant))
+            self.loop.create_task(retry_deferred_codes_periodically(tenant))
+            if ROLE_SWEEP_INTERVAL > 0 and tenant.hypixel_guild_id:
+                self.loop.create_task(sweep_roles_periodically(tenant))
+            self.loop.create_task(requeue_role_grants(tenant))
+        if PUSH_SOCKET_PATH or PUSH_PORT:
+            await start_push_server()
+        await sync_commands_if_changed()
+
+    async def close(self):
+        # Finish role grants and DMs while the connection is still up, the store only says they were queued
+        await discord_actions.drain(("roles", "dms"), DISCORD_ACTION_DRAIN_TIMEOUT)
+        discord_actions.stop()
+        await super().close()
+        await close_http_session()
+        await stop_metrics_server()
+        await stop_push_server()
+        for tenant in tenants.values():
+            await tenant.store.close()
+            await tenant.verified_members.save()
+        if MOJANG_CACHE_PATH:
+            await mojang_cache.save(MOJANG_CACHE_PATH)
+        file_io.shutdown()
+        log.info(f"📊 Mojang cache: {mojang_cache.stats()}")
+
+# Without chunking, members are fetched on demand through member_cache instead of
+# holding the whole member list in memory
+bot = VerificationBot(
+    command_prefix="!",
+    intents=intents,
+    chunk_guilds_at_startup=DISCORD_CHUNK_MEMBERS,
+    member_cache_flags=discord.MemberCacheFlags.from_intents(intents) if DISCORD_CHUNK_MEMBERS else discord.MemberCacheFlags.none()
+)
+
+# ==================== METRICS ====================
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+PIPELINE_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+BYTES_BUCKETS = (1024, 16384, 131072, 1048576, 8388608, 67108864)
+
+metrics = []  # every metric, in the order they are exposed
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter:
+    """Monotonic count, optionally split by labels"""
+    def __init__(self, name: str, documentation: str, labels: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.values = {}  # label values -> count
+        metrics.append(self)
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for key, value in self.values.items():
+            lines.append(f"{self.name}{format_labels(self.labels, key)} {value}")
+        return lines
+
+class Histogram:
+    """Distribution of observed values in fixed buckets, optionally split by labels"""
+    def __init__(self, name: str, documentation: str, buckets: tuple = LATENCY_BUCKETS, labels: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self.labels = labels
+        self.series = {}  # label values -> [count per bucket..., count above the last bucket, sum]
+        metrics.append(self)
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def time(self, **labels):
+        """Context manager observing the seconds spent in its block"""
+        return HistogramTimer(self, labels)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, series in self.series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                cumulative += count
+                bucket_label = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{format_labels(self.labels, key, bucket_label)} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.labels, key)} {series[-1]}")
+            lines.append(f"{self.name}_count{format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+class HistogramTimer:
+    def __init__(self, histogram: Histogram, labels: dict):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+class Gauge:
+    """Value read from a callback when scraped, which returns a number or {label values: number}"""
+    def __init__(self, name: str, documentation: str, callback, labels: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.labels = labels
+        metrics.append(self)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        values = self.callback()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for key, value in values.items():
+            key = key if isinstance(key, tuple) else (key,)
+            lines.append(f"{self.name}{format_labels(self.labels, key)} {value}")
+        return lines
+
+def render_metrics() -> str:
+    lines = []
+    for metric in metrics:
+        try:
+            lines.extend(metric.render())
+        except Exception as e:
+            log.warning(f"⚠️ Could not render metric {metric.name}: {e}")
+    return "\n".join(lines) + "\n"
+
+upstream_latency = Histogram(
+    "msga_upstream_request_seconds", "Latency of Mojang and Hypixel API requests", labels=("upstream", "outcome")
+)
+store_io_latency = Histogram("msga_store_io_seconds", "Duration of verification file and database I/O", labels=("op",))
+store_io_bytes = Histogram("msga_store_io_bytes", "Bytes read or written by verification file I/O", BYTES_BUCKETS, labels=("op",))
+process_tick_latency = Histogram("msga_process_tick_seconds", "Duration of one process_verified_codes pass")
+process_batch_size = Histogram("msga_process_batch_size", "Submitted codes handled per process_verified_codes pass", SIZE_BUCKETS)
+submission_to_role_latency = Histogram(
+    "msga_submission_to_role_seconds", "Time from the bot seeing a submitted code to the role being granted", PIPELINE_BUCKETS
+)
+discord_action_latency = Histogram("msga_discord_action_seconds", "Duration of queued Discord actions, retries included", PIPELINE_BUCKETS, labels=("route",))
+command_latency = Histogram("msga_command_seconds", "Time from a slash command being invoked to it completing", labels=("command",))
+verifications_total = Counter("msga_verifications_total", "Processed verification codes by result", labels=("result",))
+errors_total = Counter("msga_errors_total", "Errors by category", labels=("category",))
+event_loop_lag = Histogram(
+    "msga_event_loop_lag_seconds", "How late the event loop woke up for a timer, i.e. how long it was blocked",
+    (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+push_events_total = Counter("msga_push_events_total", "Events received on the push channel by result", labels=("result",))
+breaker_transitions = Counter(
+    "msga_breaker_transitions_total", "Circuit breaker state changes by upstream and new state", labels=("upstream", "state")
+)
+retries_total = Counter("msga_retries_total", "Codes deferred while an upstream was down, by event", labels=("event",))
+cache_lookups = Counter("msga_cache_lookups_total", "In-memory cache lookups by cache and result", labels=("cache", "result"))
+cache_evictions = Counter("msga_cache_evictions_total", "Entries evicted from full in-memory caches", labels=("cache",))
+file_checks = Counter(
+    "msga_file_checks_total", "Verification file checks by result: skipped when unchanged, changed when reloaded", labels=("result",)
+)
+reload_records_changed = Counter("msga_reload_records_changed_total", "Records that differed from memory when the verification file was reloaded")
+loop_wakeups = Counter(
+    "msga_loop_wakeups_total", "Verification loop wake-ups by result: skipped when the file turned out unchanged", labels=("result",)
+)
+role_sweep_changes = Counter("msga_role_sweep_changes_total", "Verified roles changed by the guild membership sweep", labels=("action",))
+Gauge("msga_queue_depth", "Items waiting in internal queues", lambda: {
+    "hypixel": hypixel_scheduler.queue_depth(),
+    "mojang_batch": len(mojang_batcher.pending),
+    **{f"discord_{route}": depth for route, depth in discord_actions.depth().items()}
+}, labels=("queue",))
+Gauge("msga_breaker_state", "Circuit breaker state by upstream: 0 closed, 1 half open, 2 open", lambda: {
+    name: BREAKER_STATES.index(breaker.state) for name, breaker in breakers.items()
+}, labels=("upstream",))
+Gauge("msga_codes", "Verification codes in the store by tenant and status", lambda: {
+    (tenant.name, status): tenant.store.count(status) for tenant in tenants.values() for status in CODE_STATUSES
+}, labels=("tenant", "status"))
+Gauge("msga_cache_entries", "Entries held in in-memory caches", lambda: {
+    "mojang": len(mojang_cache), "member_names": len(member_name_cache), "members": len(member_cache),
+    "guild_roster": sum(len(roster.members) for roster in guild_rosters.values())
+}, labels=("cache",))
+
+async def monitor_loop_lag():
+    """Sample event loop lag by measuring how late a fixed sleep wakes up"""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        event_loop_lag.observe(max(0.0, loop.time() - started - LOOP_LAG_INTERVAL))
+
+metrics_runner = None
+
+async def handle_metrics(request):
+    return web.Response(text=render_metrics(), content_type="text/plain", charset="utf-8")
+
+async def start_metrics_server():
+    """Serve /metrics from the bot's event loop"""
+    global metrics_runner
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    metrics_runner = web.AppRunner(app, access_log=None)
+    await metrics_runner.setup()
+    try:
+        await web.TCPSite(metrics_runner, METRICS_HOST, METRICS_PORT).start()
+        log.info(f"📈 Metrics available at http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+    except OSError as e:
+        log.error(f"❌ Could not start metrics server on {METRICS_HOST}:{METRICS_PORT}: {e}")
+        await stop_metrics_server()
+
+async def stop_metrics_server():
+    global metrics_runner
+    if metrics_runner is not None:
+        await metrics_runner.cleanup()
+        metrics_runner = None
+
+# ==================== LOGGING ====================
+# Records are handed to a background thread through a bounded queue, so a slow stdout
+# (a pipe, journald) never blocks the event loop. Context goes in `extra`, e.g.
+#     log.info("...", extra={"code": code, "stage": "lookup", "duration": 0.12})
+# and comes out as fields with LOG_FORMAT=json. Records logged with "sample": True
+# are kept at LOG_SAMPLE_RATE. The thread is started by setup_logging() when the bot starts.
+log = logging.getLogger("msga")
+
+LOG_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "sample"}
+log_records_dropped = Counter("msga_log_records_dropped_total", "Log records dropped because the log queue was full")
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record with the message and any extra fields"""
+    def format(self, record) -> str:
+        payload = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in LOG_RECORD_ATTRIBUTES:
+                payload[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload["exception"] = record.exc_text
+        if record.stack_info:
+            payload["stack"] = record.stack_info
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+class SampleFilter(logging.Filter):
+    """Keeps a fraction of the records marked sample=True, never warnings or errors"""
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record) -> bool:
+        if record.levelno >= logging.WARNING or not getattr(record, "sample", False):
+            return True
+        return random.random() < self.rate
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the log thread, dropping them when it falls behind rather than waiting"""
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            log_records_dropped.inc()
+
+    def prepare(self, record):
+        # The inherited prepare() folds the traceback into the message, keep it in exc_text
+        # instead so the output formatter can give it a field of its own
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or logging.Formatter().formatException(record.exc_info)
+            # The traceback holds on to every frame until the log thread gets to the record
+            record.exc_info = None
+        return record
+
+class LogListener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        # The queue may be full at shutdown, wait for the log thread to make room
+        self.queue.put(self._sentinel)
+
+    def stop(self):
+        # Called from atexit as well as by anyone shutting down the bot first
+        if self._thread is not None:
+            super().stop()
+
+def setup_logging() -> LogListener:
+    """Route the bot's and discord.py's records through the log thread to stdout"""
+    output = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(asctime)s %(levelname)-7s %(message)s"))
+    
+    records = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    handler = DroppingQueueHandler(records)
+    handler.addFilter(SampleFilter(LOG_SAMPLE_RATE))
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(LOG_LEVEL)
+    
+    listener = LogListener(records, output)
+    listener.start()
+    # Write out what is still queued when the process exits
+    atexit.register(listener.stop)
+    return listener
+
+# ==================== CIRCUIT BREAKERS ====================
+BREAKER_STATES = ("closed", "half_open", "open")
+
+class UpstreamUnavailable(Exception):
+    """Raised instead of making a request while the upstream's breaker is open"""
+
+class CircuitBreaker:
+    """Fails calls to an upstream fast while it is down.
+
+    Timeouts, connection errors and 5xx responses count as failures. After
+    BREAKER_FAILURE_THRESHOLD in a row the breaker opens and calls are refused without
+    a request. Once BREAKER_RESET_TIMEOUT has passed one call is let through as a probe:
+    success closes the breaker, failure keeps it open for another timeout.
+    """
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0  # Consecutive failures
+        self.probe_at = 0.0  # time.monotonic() from which the next probe is let through
+        self.on_close = None  # Called with the upstream name when the breaker closes again
+
+    def ready(self) -> bool:
+        """Whether a call would be let through now"""
+        return self.state == "closed" or time.monotonic() >= self.probe_at
+
+    def allow(self) -> bool:
+        """Whether to make a call, claims the probe while the breaker is open"""
+        if self.state == "closed":
+            return True
+        now = time.monotonic()
+        if now < self.probe_at:
+            return False
+        # A probe that never reports back only blocks the next one for another timeout
+        self._set_state("half_open")
+        self.probe_at = now + self.reset_timeout
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        if self.state != "closed":
+            self._set_state("closed")
+            if self.on_close:
+                self.on_close(self.name)
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or (self.state == "closed" and self.failures >= self.failure_threshold):
+            self._set_state("open")
+            self.probe_at = time.monotonic() + self.reset_timeout
+
+    def _set_state(self, state: str):
+        if state == self.state:
+            return
+        self.state = state
+        breaker_transitions.inc(upstream=self.name, state=state)
+        if state == "open":
+            log.warning(f"🔌 {self.name} looks down after {self.failures} failure(s), failing fast for {self.reset_timeout:.0f}s")
+        elif state == "closed":
+            log.info(f"✅ {self.name} is back up")
+
+breakers = {
+    name: CircuitBreaker(name, BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT)
+    for name in ("mojang", "mojang_bulk", "hypixel")
+}
+
+# ==================== HYPIXEL API ====================
+PRIORITY_INTERACTIVE = 0  # Verifications a player is waiting on
+PRIORITY_BACKGROUND = 1  # Sweeps and other work nobody is waiting on
+
+class HypixelScheduler:
+    """Paces Hypixel API calls to the key's quota using the RateLimit-* response headers.
+
+    Every call takes a token from a bucket that is set from the last RateLimit-Remaining
+    header and refilled when RateLimit-Reset runs out. A refill starts a new window of
+    `window` seconds, which the next response's RateLimit-Reset replaces. Callers without
+    a token wait in a priority queue instead of failing, and a 429 empties the bucket and
+    queues the request again, so verifications wait for quota rather than being lost.
+    """
+    def __init__(self, limit: int, window: float):
+        self.limit = limit  # Requests per window, updated from RateLimit-Limit
+        self.window = window
+        self.tokens = limit
+        self.reset_at = 0.0  # time.monotonic() at which the bucket refills
+        self.in_flight = 0
+        self.waiters = []  # heap of (priority, sequence, future)
+        self.sequence = itertools.count()
+        self.timer = None
+
+    def queue_depth(self) -> int:
+        return sum(1 for _, _, future in self.waiters if not future.done())
+
+    def _dispatch(self):
+        now = time.monotonic()
+        if self.waiters and now >= self.reset_at:
+            # The window is over, refill and start the next one. Until a response says when
+            # it ends it lasts a full window, so the bucket is refilled once per window.
+            self.tokens = max(1, self.limit - self.in_flight)
+            self.reset_at = now + self.window
+        
+        while self.waiters and self.tokens > 0:
+            _, _, future = heapq.heappop(self.waiters)
+            if future.done():
+                continue  # Caller gave up waiting
+            self.tokens -= 1
+            self.in_flight += 1
+            future.set_result(None)
+        
+        if self.waiters and self.timer is None and self.reset_at > now:
+            self.timer = asyncio.get_running_loop().call_later(self.reset_at - now, self._on_timer)
+
+    def _on_timer(self):
+        self.timer = None
+        self._dispatch()
+
+    async def _acquire(self, priority: int):
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiters, (priority, next(self.sequence), future))
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Cancelled right after being granted a token, hand it back
+                self.in_flight -= 1
+                self.tokens += 1
+                self._dispatch()
+            raise
+
+    def _update(self, status: int, headers):
+        now = time.monotonic()
+        limit = headers.get("RateLimit-Limit")
+        remaining = headers.get("RateLimit-Remaining")
+        reset = headers.get("RateLimit-Reset")
+        if limit and limit.isdigit():
+            self.limit = int(limit)
+        if reset and reset.isdigit():
+            self.reset_at = now + int(reset)
+        if remaining and remaining.isdigit():
+            # Requests still in flight have taken tokens the server hasn't counted yet
+            self.tokens = max(0, int(remaining) - self.in_flight)
+        
+        if status == 429:
+            self.tokens = 0
+            retry_after = headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                self.reset_at = max(self.reset_at, now + int(retry_after))
+            elif self.reset_at <= now:
+                self.reset_at = now + 1
+
+    async def get(self, endpoint: str, params: dict = None, priority: int = PRIORITY_INTERACTIVE):
+        """GET an API endpoint once quota allows, returns (status, JSON body or None).
+
+        Raises UpstreamUnavailable without a request while Hypixel's breaker is open.
+        """
+        breaker = breakers["hypixel"]
+        while True:
+            if not breaker.allow():
+                raise UpstreamUnavailable("Hypixel API unavailable")
+            await self._acquire(priority)
+            started = time.perf_counter()
+            outcome = "error"
+            try:
+                async with get_http_session().get(
+                    f"{HYPIXEL_API_URL}/{endpoint}",
+                    params={**(params or {}), "key": HYPIXEL_API_KEY}
+                ) as resp:
+                    status = resp.status
+                    outcome = str(status)
+                    headers = resp.headers
+                    data = await resp.json() if status == 200 else None
+            except asyncio.TimeoutError:
+                outcome = "timeout"
+                breaker.record_failure()
+                raise
+            except aiohttp.ClientError:
+                breaker.record_failure()
+                raise
+            finally:
+                self.in_flight -= 1
+                upstream_latency.observe(time.perf_counter() - started, upstream="hypixel", outcome=outcome)
+                if outcome != "200":
+                    errors_total.inc(category="hypixel")
+            if status >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            self._update(status, headers)
+            self._dispatch()
+            
+            if status != 429:
+                return status, data
+            log.warning(f"⏳ Hypixel rate limit reached, waiting {max(0.0, self.reset_at - time.monotonic()):.0f}s for quota")
+
+hypixel_scheduler = HypixelScheduler(HYPIXEL_RATE_LIMIT, HYPIXEL_RATE_WINDOW)
+
+# ==================== CACHES ====================
+class TTLCache:
+    """Bounded LRU cache whose entries expire after a time-to-live, counted under its name in /metrics"""
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.data = OrderedDict()  # key -> (expires_at, value), least recently used first
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.data)
+
+    def get(self, key, default=None):
+        item = self.data.get(key)
+        if item is None:
+            self.misses += 1
+            cache_lookups.inc(cache=self.name, result="miss")
+            return default
+        expires_at, value = item
+        if expires_at <= time.time():
+            del self.data[key]
+            self.misses += 1
+            cache_lookups.inc(cache=self.name, result="miss")
+            return default
+        self.data.move_to_end(key)
+        self.hits += 1
+        cache_lookups.inc(cache=self.name, result="hit")
+        return value
+
+    def set(self, key, value, ttl: float = None):
+        self.data[key] = (time.time() + (self.ttl if ttl is None else ttl), value)
+        self.data.move_to_end(key)
+        while len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+            self.evictions += 1
+            cache_evictions.inc(cache=self.name)
+
+    def pop(self, key, default=None):
+        item = self.data.pop(key, None)
+        return default if item is None else item[1]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+        }
+
+    async def save(self, path: str):
+        """Write unexpired entries to a JSON file, on the file's I/O thread"""
+        now = time.time()
+        items = [[key, expires_at, value] for key, (expires_at, value) in self.data.items() if expires_at > now]
+        try:
+            await file_io.run(path, write_json_file, path, items)
+        except Exception as e:
+            log.warning(f"⚠️ Could not save cache to {path}: {e}")
+
+    async def load(self, path: str):
+        """Load entries written by save(), dropping any that expired meanwhile"""
+        try:
+            items = await file_io.run(path, read_json_file, path)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            log.warning(f"⚠️ Could not load cache from {path}: {e}")
+            return
+        now = time.time()
+        for key, expires_at, value in items[-self.maxsize:]:
+            if expires_at > now:
+                self.data[key] = (expires_at, value)
+        log.info(f"✅ Loaded {len(self.data)} cached entries from {path}")
+
+mojang_cache = TTLCache("mojang", MOJANG_CACHE_SIZE, MOJANG_CACHE_TTL)  # lowercase username -> get_minecraft_uuid result
+member_name_cache = TTLCache("member_names", MEMBER_NAME_CACHE_SIZE, MEMBER_NAME_CACHE_TTL)  # (Discord guild id, user id) -> member name ("" if not a member)
+member_cache = TTLCache("members", MEMBER_CACHE_SIZE, MEMBER_CACHE_TTL)  # (Discord guild id, user id) -> discord.Member (False if not a member)
+
+def normalize_uuid(uuid: str) -> str:
+    return uuid.replace("-", "").lower()
+
+class GuildRoster:
+    """Cached member list of the Hypixel guild, so membership checks are a set lookup.
+
+    The roster is fetched by guild id with one request and refreshed lazily once it
+    is older than GUILD_ROSTER_REFRESH_INTERVAL. A failed fetch keeps the old roster
+    and is retried after at most a minute.
+    """
+    def __init__(self, guild_id: str, refresh_interval: float):
+        self.guild_id = guild_id
+        self.refresh_interval = refresh_interval
+        self.members = set()  # Normalized member UUIDs
+        self.guild_name = None
+        self.fetched_at = 0
+        self.next_refresh = 0
+        self.lock = asyncio.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.guild_id) and self.refresh_interval > 0
+
+    def add(self, uuid: str):
+        self.members.add(normalize_uuid(uuid))
+
+    async def contains(self, uuid: str) -> bool:
+        if not self.enabled:
+            return False
+        if time.time() >= self.next_refresh:
+            await self.refresh()
+        return normalize_uuid(uuid) in self.members
+
+    async def refresh(self, force: bool = False, priority: int = PRIORITY_INTERACTIVE) -> bool:
+        """Fetch the guild's member list, returns False if the fetch failed"""
+        async with self.lock:
+            # Another caller may have refreshed while we waited for the lock
+            if not force and time.time() < self.next_refresh:
+                return True
+            
+            try:
+                status, data = await hypixel_scheduler.get("guild", {"id": self.guild_id}, priority)
+                if status != 200:
+                    raise RuntimeError(f"Hypixel API error: {status}")
+                guild = data.get("guild") if data.get("success") else None
+                if guild is None:
+                    raise RuntimeError("Hypixel API returned no guild")
+            except Exception as e:
+                log.warning(f"⚠️ Could not refresh guild roster: {e or type(e).__name__}")
+                self.next_refresh = time.time() + min(60, self.refresh_interval)
+                return False
+            
+            self.members = {normalize_uuid(member["uuid"]) for member in guild.get("members", []) if member.get("uuid")}
+            self.guild_name = guild.get("name")
+            self.fetched_at = time.time()
+            self.next_refresh = self.fetched_at + self.refresh_interval
+            log.info(f"✅ Refreshed guild roster: {len(self.members)} members in {self.guild_name}")
+            return True
+
+guild_rosters = {}  # Hypixel guild id -> GuildRoster, shared by tenants verifying against the same guild
+
+def get_guild_roster(guild_id: str) -> GuildRoster:
+    roster = guild_rosters.get(guild_id)
+    if roster is None:
+        roster = guild_rosters[guild_id] = GuildRoster(guild_id, GUILD_ROSTER_REFRESH_INTERVAL)
+    return roster
+
+# ==================== HTTP CLIENT ====================
+http_session = None
+
+def get_http_session() -> aiohttp.ClientSession:
+    """Return the bot-wide HTTP session, creating it on first use.
+
+    Connections to api.mojang.com and api.hypixel.net are pooled and kept alive
+    between requests, so a verification doesn't pay a TCP and TLS handshake per call.
+    """
+    global http_session
+    if http_session is None or http_session.closed:
+        connector = aiohttp.TCPConnector(
+            limit_per_host=HTTP_POOL_SIZE_PER_HOST,
+            keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=HTTP_DNS_CACHE_TTL
+        )
+        http_session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+        )
+    return http_session
+
+async def close_http_session():
+    global http_session
+    if http_session is not None and not http_session.closed:
+        await http_session.close()
+    http_session = None
+
+# ==================== HELPER FUNCTIONS ====================
+class CodeAllocator:
+    """Hands out codes that are unique among the live ones, in O(1) and without retries.
+
+    The free codes form a virtual array that is only materialised where it has been
+    shuffled: drawing swaps a random slot with the last one and shrinks the array
+    (a lazy Fisher-Yates shuffle). A free code below the end of the array always sits
+    in its own slot, only the slots of codes in use lend their place to free codes from
+    above the end, so memory grows with the codes in use, not with the size of the code
+    space or the number of codes ever issued.
+    """
+    def __init__(self, length: int, cooldown: float = 0):
+        self.length = length
+        self.cooldown = cooldown
+        self.free = 10 ** length  # slots [0, free) hold the free codes
+        self.slots = {}  # slot -> code number, for slots that don't hold their own index
+        self.positions = {}  # code number -> slot, for codes not in their own slot
+        self.cooling = OrderedDict()  # code number -> time it can be issued again
+        self.rng = secrets.SystemRandom()
+
+    def _slot(self, index: int) -> int:
+        return self.slots.get(index, index)
+
+    def _set_slot(self, index: int, number: int):
+        if index == number:
+            self.slots.pop(index, None)
+            self.positions.pop(number, None)
+        else:
+            self.slots[index] = number
+            self.positions[number] = index
+
+    def _take(self, index: int) -> int:
+        """Remove the code at a slot from the free array, returns its number"""
+        number = self._slot(index)
+        last = self.free - 1
+        self._set_slot(index, self._slot(last))
+        self.slots.pop(last, None)
+        self.positions.pop(number, None)
+        self.free = last
+        return number
+
+    def _put(self, number: int):
+        """Add a code back at the end of the free array, restoring the slots it or the end displaced"""
+        end = self.free
+        self.free += 1
+        if number < end:
+            # Back in its own slot, the code lent to it from above the end moves instead
+            lent = self.slots.pop(number)
+            del self.positions[lent]
+            number = lent
+        if number != end and end in self.positions:
+            # The end slot's own code is free and lent out below, it returns to its slot
+            index = self.positions.pop(end)
+            self.slots[index] = number
+            self.positions[number] = index
+            number = end
+        if number != end:
+            self.slots[end] = number
+            self.positions[number] = end
+
+    def _number(self, code: str):
+        if len(code) == self.length and code.isdigit():
+            return int(code)
+        return None
+
+    def _is_free(self, number: int) -> bool:
+        index = self.positions.get(number, number)
+        return index < self.free and self._slot(index) == number
+
+    def _release_cooled(self):
+        now = time.monotonic()
+        while self.cooling:
+            number, ready_at = next(iter(self.cooling.items()))
+            if ready_at > now:
+                break
+            del self.cooling[number]
+            self._put(number)
+
+    def allocate(self):
+        """Return a fresh code, or None if every code is in use"""
+        self._release_cooled()
+        if not self.free:
+            return None
+        number = self._take(self.rng.randrange(self.free))
+        return str(number).zfill(self.length)
+
+    def reserve(self, code: str):
+        """Mark a code that is already in use (e.g. loaded from the file) as taken"""
+        number = self._number(code)
+        if number is None:
+            return
+        if self._is_free(number):
+            self._take(self.positions.get(number, number))
+        else:
+            self.cooling.pop(number, None)
+
+    def release(self, code: str):
+        """Give a code back once it's gone from the store, after the cooldown"""
+        number = self._number(code)
+        if number is None or number in self.cooling or self._is_free(number):
+            return
+        if self.cooldown > 0:
+            self.cooling[number] = time.monotonic() + self.cooldown
+        else:
+            self._put(number)
+
+def generate_code(tenant):
+    """Generate a verification code no live entry of the tenant uses, or None if none are left"""
+    return tenant.store.allocator.allocate()
+
+class FileIOExecutor:
+    """Runs blocking file work off the event loop, on one background thread per file.
+
+    Jobs for a file run one at a time in the order they were submitted, so writes to it
+    can't interleave, while a slow write to one file doesn't hold up another.
+    """
+    def __init__(self):
+        self.executors = {}  # path -> single-thread executor
+
+    def run(self, path: str, fn, *args) -> asyncio.Future:
+        """Queue fn(*args) behind earlier jobs for the same file, await the result"""
+        executor = self.executors.get(path)
+        if executor is None:
+            executor = self.executors[path] = ThreadPoolExecutor(max_workers=1, thread_name_prefix="file-io")
+        return asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+    def shutdown(self):
+        for executor in self.executors.values():
+            executor.shutdown(wait=True)
+        self.executors = {}
+
+file_io = FileIOExecutor()
+
+def read_json_file(path: str):
+    """Read a whole JSON file, run through file_io"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def keep_file_permissions(path: str, tmp_path: str):
+    """Give a temp file the mode and owner of the file it is renamed over.
+
+    The plugin may run as another user, which must keep its access to the file.
+    The owner is only changed where the bot is allowed to.
+    """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return
+    os.chmod(tmp_path, stat.S_IMODE(st.st_mode))
+    if not hasattr(os, "chown"):
+        return
+    try:
+        os.chown(tmp_path, st.st_uid, st.st_gid)
+    except PermissionError:
+        try:
+            # Without the right to give files away, the group may still be ours to set
+            os.chown(tmp_path, -1, st.st_gid)
+        except PermissionError:
+            pass
+
+def write_json_file(path: str, data):
+    """Write a JSON file through a temp file renamed over it, run through file_io"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    keep_file_permissions(path, tmp_path)
+    os.replace(tmp_path, path)
+
+def read_text_file(path: str) -> str:
+    """Read a whole text file, run through file_io"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+def write_text_file(path: str, text: str):
+    """Write a whole text file, run through file_io"""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+def iter_json_object(f, block_size: int = 1 << 20):
+    """Yield the members of the JSON object in text file f as (key, value) pairs.
+
+    The same as json.load(f).items(), but the file is read a block at a time and parsed
+    one member per call into the C decoder. json.load() holds the GIL until the whole
+    file is parsed, which stalls the event loop for seconds on a large verification file.
+    Between members the interpreter can hand the GIL back to the loop.
+    """
+    decoder = json.JSONDecoder()
+    whitespace = json.decoder.WHITESPACE.match
+    text, pos, opened = "", 0, False
+    while True:
+        try:
+            # pos only moves past whole members, a member cut off at the end of the
+            # block raises and is parsed again once the next block is read
+            end = whitespace(text, pos).end()
+            if not opened:
+                if text[end] != "{":
+                    raise json.JSONDecodeError("Expecting '{'", text, end)
+                end = whitespace(text, end + 1).end()
+                if text[end] == "}":
+                    pos = end + 1
+                    break
+                pos, opened = end, True
+                continue
+            if text[end] != '"':
+                raise json.JSONDecodeError("Expecting property name enclosed in double quotes", text, end)
+            key, end = json.decoder.scanstring(text, end + 1)
+            end = whitespace(text, end).end()
+            if text[end] != ":":
+                raise json.JSONDecodeError("Expecting ':' delimiter", text, end)
+            value, end = decoder.raw_decode(text, whitespace(text, end + 1).end())
+            end = whitespace(text, end).end()
+            if text[end] not in ",}":
+                raise json.JSONDecodeError("Expecting ',' delimiter", text, end)
+        except (ValueError, IndexError) as e:
+            block = f.read(block_size)
+            if not block:
+                if isinstance(e, ValueError):
+                    raise
+                raise json.JSONDecodeError("Unexpected end of file", text, len(text)) from None
+            text, pos = text[pos:] + block, 0
+            continue
+        pos = end + 1
+        yield key, value
+        if text[end] == "}":
+            break
+
+    # Like json.load(), refuse anything but whitespace after the object
+    text = text[pos:]
+    while True:
+        end = whitespace(text).end()
+        if end < len(text):
+            raise json.JSONDecodeError("Extra data", text, end)
+        text = f.read(block_size)
+        if not text:
+            return
+
+def load_verification_codes(path: str, keep=None):
+    """Load verification codes from JSON file.
+
+    With keep(code, entry) only the codes it accepts are returned, so callers after a
+    few changes never hold a copy of the whole file.
+    """
+    try:
+        started = time.perf_counter()
+        # Read in one go, parsing block by block while the plugin rewrites the file in
+        # place would see a torn file far more often
+        with open(path, 'rb') as f:
+            raw = f.read()
+        data = {}
+        total = 0
+        for code, entry in iter_json_object(io.TextIOWrapper(io.BytesIO(raw), encoding='utf-8')):
+            total += 1
+            if keep is None or keep(code, entry):
+                data[code] = entry
+        store_io_latency.observe(time.perf_counter() - started, op="load")
+        store_io_bytes.observe(len(raw), op="load")
+        log.info(
+            f"✅ Loaded {total} verification codes from {path}",
+            extra={"stage": "load", "duration": time.perf_counter() - started, "sample": True}
+        )
+        return data
+    except FileNotFoundError:
+        log.error(f"❌ Verification file not found at {path}")
+        return {}
+    except json.JSONDecodeError as e:
+        log.error(f"❌ Error parsing JSON: {e}")
+        errors_total.inc(category="store")
+        return {}
+    except Exception as e:
+        log.error(f"❌ Error loading verification codes: {e}")
+        errors_total.inc(category="store")
+        return {}
+
+def encode_verification_codes(data: dict):
+    """Yield json.dumps(data, indent=2) as UTF-8, VERIFICATION_BATCH_SIZE codes at a time.
+
+    Each entry is encoded on its own, so the GIL can go back to the event loop in between.
+    Not with indent, which makes json use its Python encoder: that builds closures that
+    reference each other on every call, garbage only a full collection frees, and those
+    stall the loop too once the store is large. The C encoder's item separator lays out
+    the fields of a flat entry the same way, anything nested is valid but not indented.
+
+    data may be a store's live entries, changed on the loop meanwhile: the codes are
+    listed up front and each entry is copied in one dict() call before it is encoded.
+    Codes removed before their turn are left out.
+    """
+    encoder = json.JSONEncoder(separators=(",\n    ", ": "))
+    separator = "{\n  "
+    parts = []
+    for code in list(data):
+        entry = data.get(code)
+        if entry is None:
+            continue
+        fields = encoder.encode(dict(entry))[1:-1]
+        parts.append(separator + json.dumps(code) + (": {\n    " + fields + "\n  }" if fields else ": {}"))
+        separator = ",\n  "
+        if len(parts) >= VERIFICATION_BATCH_SIZE:
+            yield "".join(parts).encode('utf-8')
+            parts = []
+    parts.append("{}" if separator == "{\n  " else "\n}")
+    yield "".join(parts).encode('utf-8')
+
+def save_verification_codes(path: str, data, with_hash: bool = False):
+    """Save verification codes to JSON file (written to a temp file, then renamed over it).
+
+    Returns the (signature, content hash) of the written file, taken before the rename so a
+    plugin write right after it is never mistaken for our own, or None if the save failed.
+    """
+    try:
+        started = time.perf_counter()
+        tmp_path = path + ".tmp"
+        content_hash = hashlib.blake2b(digest_size=16) if with_hash else None
+        with open(tmp_path, 'wb') as f:
+            for chunk in encode_verification_codes(data):
+                f.write(chunk)
+                if content_hash is not None:
+                    content_hash.update(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+            st = os.fstat(f.fileno())
+        keep_file_permissions(path, tmp_path)
+        size = st.st_size
+        # The rename keeps the inode and mtime, so this is the signature the file will have
+        signature = (st.st_mtime_ns, st.st_size, st.st_ino)
+        content_hash = content_hash.digest() if content_hash is not None else None
+        os.replace(tmp_path, path)
+        duration = time.perf_counter() - started
+        store_io_latency.observe(duration, op="save")
+        store_io_bytes.observe(size, op="save")
+        log.info(
+            f"✅ Saved {len(data)} verification codes to {path}",
+            extra={"stage": "save", "duration": duration, "sample": True}
+        )
+        return signature, content_hash
+    except Exception as e:
+        log.error(f"❌ Error saving verification codes: {e}", extra={"stage": "save"})
+        errors_total.inc(category="store")
+        return None
+
+def record_reload(path: str, records_changed: int):
+    """Count and log a reload of the verification file that picked up outside changes"""
+    reload_records_changed.inc(records_changed)
+    log.info(
+        f"🔁 Reloaded {path}: {records_changed} record(s) changed",
+        extra={"stage": "reload", "records_changed": records_changed, "sample": True}
+    )
+
+def append_journal(journal_path: str, records: list):
+    """Append change records to the journal, one JSON object per line"""
+    try:
+        started = time.perf_counter()
+        lines = "".join(json.dumps(record, separators=(",", ":")) + "\n" for record in records)
+        with open(journal_path, 'a', encoding='utf-8') as f:
+            f.write(lines)
+        store_io_latency.observe(time.perf_counter() - started, op="journal")
+        store_io_bytes.observe(len(lines), op="journal")
+        return True
+    except Exception as e:
+        log.error(f"❌ Error writing journal: {e}")
+        errors_total.inc(category="store")
+        return False
+
+def load_journal(journal_path: str) -> list:
+    """Load change records from the journal, skipping a torn last line.
+
+    Records set aside by an unfinished compaction come first.
+    """
+    records = []
+    for path in (journal_path + ".old", journal_path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        log.warning(f"⚠️ Skipping unreadable journal line: {line[:80]!r}")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            log.error(f"❌ Error loading journal: {e}")
+    return records
+
+def rotate_journal(journal_path: str, records: list) -> bool:
+    """Set the journal aside before a compaction, so changes journaled during it are kept.
+
+    The changes that weren't journaled yet are appended first, so the set-aside journal
+    ends with the state of every code it touches as the compaction started. Codes changed
+    while the file is written are dirty again and reach the new journal with their later
+    state. If a crash leaves the set-aside journal behind, replaying both journals over the
+    written file brings every code back to its last journaled state. Returns False without
+    rotating if that append failed.
+    """
+    if records and not append_journal(journal_path, records):
+        return False
+    old_path = journal_path + ".old"
+    try:
+        if os.path.exists(old_path):
+            # A previous compaction failed, its records aren't in the JSON file yet
+            with open(journal_path, 'r', encoding='utf-8') as src, open(old_path, 'a', encoding='utf-8') as dst:
+                dst.write(src.read())
+            os.remove(journal_path)
+        else:
+            os.replace(journal_path, old_path)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        log.error(f"❌ Error rotating journal: {e}")
+    return True
+
+def append_archive(archive_path: str, records: list):
+    """Append expired codes to the archive file, one JSON object per line"""
+    try:
+        with open(archive_path, 'a', encoding='utf-8') as f:
+            f.write("".join(json.dumps(record, separators=(",", ":")) + "\n" for record in records))
+    except Exception as e:
+        log.error(f"❌ Error writing archive: {e}")
+
+def remove_rotated_journal(journal_path: str):
+    """Drop the journal set aside by rotate_journal() once the JSON file holds its changes"""
+    try:
+        os.remove(journal_path + ".old")
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        log.error(f"❌ Error removing rotated journal: {e}")
+
+def get_file_signature(path: str):
+    """Return (mtime_ns, size, inode) of a file, or None if it doesn't exist"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+def hash_file(path: str):
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.blake2b(f.read(), digest_size=16).digest()
+    except OSError:
+        return None
+
+class FileFingerprint:
+    """Cheap change detection for a file that is re-read only when it really changed.
+
+    The stat signature (mtime, size, inode) is checked first. With use_hash the
+    content hash is compared too, so a rewrite with identical content is skipped.
+    """
+    def __init__(self, path: str, use_hash: bool = False):
+        self.path = path
+        self.use_hash = use_hash
+        self.signature = None
+        self.content_hash = None
+
+    async def check(self) -> bool:
+        """Return True if the file changed since the last check or update()"""
+        signature = get_file_signature(self.path)
+        if signature is None or signature == self.signature:
+            file_checks.inc(result="skipped")
+            return False
+        self.signature = signature
+        
+        if self.use_hash:
+            content_hash = await file_io.run(self.path, hash_file, self.path)
+            if content_hash is not None and content_hash == self.content_hash:
+                file_checks.inc(result="skipped")
+                return False
+            self.content_hash = content_hash
+        file_checks.inc(result="changed")
+        return True
+
+    def record(self, signature, content_hash):
+        """Record a file we wrote ourselves as seen, with the state save_verification_codes returned"""
+        self.signature = signature
+        self.content_hash = content_hash
+
+async def get_minecraft_uuid(username: str) -> dict:
+    """Get Minecraft UUID from username using Mojang API (cached, usernames are case-insensitive)"""
+    key = username.lower()
+    cached = mojang_cache.get(key)
+    if cached is not None:
+        return cached
+    
+    if MOJANG_BATCH_WINDOW > 0:
+        result = await mojang_batcher.lookup(username)
+    else:
+        result = await fetch_minecraft_uuid(username)
+    
+    if result["success"]:
+        mojang_cache.set(key, result)
+    elif result.get("not_found"):
+        mojang_cache.set(key, result, ttl=MOJANG_NEGATIVE_CACHE_TTL)
+    return result
+
+async def fetch_minecraft_uuid(username: str) -> dict:
+    """Look up a single username with the Mojang profile endpoint.
+
+    Results marked unavailable come from an outage or rate limit and are worth retrying.
+    """
+    breaker = breakers["mojang"]
+    if not breaker.allow():
+        return {"success": False, "unavailable": True, "error": "Mojang API unavailable"}
+    session = get_http_session()
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        async with session.get(f"{MOJANG_API_URL}/users/profiles/minecraft/{username}") as resp:
+            outcome = str(resp.status)
+            if resp.status >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            if resp.status == 200:
+                data = await resp.json()
+                return {"success": True, "uuid": data["id"], "name": data["name"]}
+            elif resp.status == 404:
+                return {"success": False, "not_found": True, "error": "Minecraft account not found"}
+            elif resp.status == 429 or resp.status >= 500:
+                return {"success": False, "unavailable": True, "error": f"Mojang API error: {resp.status}"}
+            else:
+                return {"success": False, "error": f"Mojang API error: {resp.status}"}
+    except asyncio.TimeoutError:
+        outcome = "timeout"
+        breaker.record_failure()
+        return {"success": False, "unavailable": True, "error": "Mojang API timeout"}
+    except aiohttp.ClientError as e:
+        breaker.record_failure()
+        return {"success": False, "unavailable": True, "error": str(e) or type(e).__name__}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+    finally:
+        upstream_latency.observe(time.perf_counter() - started, upstream="mojang", outcome=outcome)
+        if outcome not in ("200", "404"):
+            errors_total.inc(category="mojang")
+
+async def fetch_minecraft_uuids_bulk(usernames: list) -> dict:
+    """Look up up to 10 usernames in one request, returns lowercase username -> result.
+
+    Raises on any API error so the caller can fall back to single lookups.
+    """
+    breaker = breakers["mojang_bulk"]
+    if not breaker.allow():
+        raise UpstreamUnavailable("Mojang bulk API unavailable")
+    session = get_http_session()
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        async with session.post(
+            f"{MINECRAFT_SERVICES_API_URL}/minecraft/profile/lookup/bulk/byname",
+            json=usernames
+        ) as resp:
+            outcome = str(resp.status)
+            if resp.status >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            if resp.status != 200:
+                raise RuntimeError(f"Mojang API error: {resp.status}")
+            profiles = await resp.json()
+    except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+        if isinstance(e, asyncio.TimeoutError):
+            outcome = "timeout"
+        breaker.record_failure()
+        raise
+    finally:
+        upstream_latency.observe(time.perf_counter() - started, upstream="mojang_bulk", outcome=outcome)
+        if outcome != "200":
+            errors_total.inc(category="mojang")
+    
+    found = {profile["name"].lower(): profile for profile in profiles}
+    results = {}
+    for username in usernames:
+        profile = found.get(username.lower())
+        if profile:
+            results[username.lower()] = {"success": True, "uuid": profile["id"], "name": profile["name"]}
+        else:
+            # Names missing from a successful bulk response don't exist
+            results[username.lower()] = {"success": False, "not_found": True, "error": "Minecraft account not found"}
+    return results
+
+class MojangBatcher:
+    """Coalesces username lookups made within MOJANG_BATCH_WINDOW into bulk requests.
+
+    A lookup waits at most one window (or until MOJANG_BATCH_SIZE names are queued).
+    A window holding a single name uses the normal single lookup, and a failed bulk
+    request falls back to single lookups for each of its names.
+    """
+    def __init__(self):
+        self.pending = {}  # lowercase username -> (username, future)
+        self.flush_handle = None
+        self.tasks = set()  # Running batches, referenced so they aren't garbage collected mid-run
+
+    async def lookup(self, username: str) -> dict:
+        key = username.lower()
+        item = self.pending.get(key)
+        if item is None:
+            loop = asyncio.get_running_loop()
+            item = (username, loop.create_future())
+            self.pending[key] = item
+            if len(self.pending) >= MOJANG_BATCH_SIZE:
+                self.flush()
+            elif self.flush_handle is None:
+                self.flush_handle = loop.call_later(MOJANG_BATCH_WINDOW, self.flush)
+        # Shield so one cancelled caller doesn't cancel the lookup for the others
+        return await asyncio.shield(item[1])
+
+    def flush(self):
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        batch = list(self.pending.values())
+        self.pending = {}
+        for start in range(0, len(batch), MOJANG_BATCH_SIZE):
+            task = asyncio.ensure_future(self.resolve_or_fail(batch[start:start + MOJANG_BATCH_SIZE]))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def resolve_or_fail(self, batch: list):
+        """Resolve a batch, handing any unexpected error to its callers so none of them waits forever"""
+        try:
+            await self.resolve(batch)
+        except asyncio.CancelledError:
+            for _, future in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            log.error(f"❌ Mojang lookup batch failed: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+    async def resolve(self, batch: list):
+        results = {}
+        # While the bulk endpoint is down, go straight to single lookups
+        if len(batch) > 1 and breakers["mojang_bulk"].ready():
+            try:
+                results = await fetch_minecraft_uuids_bulk([username for username, _ in batch])
+            except Exception as e:
+                log.warning(f"⚠️ Bulk Mojang lookup failed ({e or type(e).__name__}), falling back to single lookups")
+        
+        missing = [(username, future) for username, future in batch if username.lower() not in results]
+        if missing:
+            singles = await asyncio.gather(*(fetch_minecraft_uuid(username) for username, _ in missing))
+            for (username, _), result in zip(missing, singles):
+                results[username.lower()] = result
+        
+        for username, future in batch:
+            if not future.done():
+                future.set_result(results[username.lower()])
+
+mojang_batcher = MojangBatcher()
+
+async def check_guild_membership(tenant, uuid: str) -> dict:
+    """Check if a player is in the tenant's Hypixel guild"""
+    if await tenant.roster.contains(uuid):
+        return {"success": True, "guild_name": tenant.roster.guild_name}
+    
+    # Not in the cached roster, the player may have joined since the last refresh
+    result = await query_player_guild(uuid, tenant.hypixel_guild_id)
+    if result["success"]:
+        tenant.roster.add(uuid)
+    return result
+
+async def query_player_guild(uuid: str, hypixel_guild_id: str, priority: int = PRIORITY_INTERACTIVE) -> dict:
+    """Check if a player is in the given Hypixel guild with a live per-player request"""
+    try:
+        status, data = await hypixel_scheduler.get("guild", {"player": uuid}, priority)
+        if status == 200:
+            if not data.get("success"):
+                return {"success": False, "error": "Hypixel API request failed"}
+            
+            guild = data.get("guild")
+            if guild is None:
+                return {"success": False, "error": "Player is not in any guild"}
+            
+            # Check if it's the correct guild - the guild id is a hex string (MongoDB ObjectId)
+            if guild.get("_id") == hypixel_guild_id:
+                return {"success": True, "guild_name": guild.get("name")}
+            else:
+                return {"success": False, "error": f"Player is in a different guild: {guild.get('name')}"}
+        elif status >= 500:
+            return {"success": False, "unavailable": True, "error": f"Hypixel API error: {status}"}
+        else:
+            return {"success": False, "error": f"Hypixel API error: {status}"}
+    except asyncio.TimeoutError:
+        return {"success": False, "unavailable": True, "error": "Hypixel API timeout"}
+    except UpstreamUnavailable as e:
+        return {"success": False, "unavailable": True, "error": str(e)}
+    except aiohttp.ClientError as e:
+        return {"success": False, "unavailable": True, "error": str(e) or type(e).__name__}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+class RetryQueue:
+    """Codes deferred because Mojang or Hypixel was unavailable.
+
+    A deferred code keeps its place in the store with status "retrying" and the
+    retry_at, retry_attempts and retry_upstream fields, so the queue survives restarts
+    like any other change. It goes back to "submitted" when its backoff runs out, or
+    straight away when the upstream's breaker closes again. While the upstream is still
+    down only one due code is let through at a time, as the breaker's probe.
+    Each tenant has its own queue over its own store.
+    """
+    def __init__(self, tenant):
+        self.tenant = tenant
+        self.wakeup = asyncio.Event()
+        self.recovered_upstreams = set()  # Upstreams whose breaker closed since the last release
+
+    async def defer(self, code: str, upstream: str, error: str) -> bool:
+        """Schedule a retry with exponential backoff and jitter, returns False once attempts run out"""
+        store = self.tenant.store
+        attempts = (await store.get(code)).get("retry_attempts", 0) + 1
+        if attempts > RETRY_MAX_ATTEMPTS:
+            retries_total.inc(event="exhausted")
+            return False
+        delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempts - 1))
+        # Jitter spreads out the codes that failed together
+        delay = random.uniform(delay / 2, delay)
+        # Whole seconds, the plugin's JSON parser only reads integers
+        await store.update(
+            code, retry_at=int(time.time() + delay) + 1, retry_attempts=attempts, retry_upstream=upstream, retry_error=error
+        )
+        retries_total.inc(event="deferred")
+        log.warning(
+            f"⏳ {error}, retrying code {code} in {delay:.0f}s (attempt {attempts}/{RETRY_MAX_ATTEMPTS})",
+            extra={"code": code, "tenant": self.tenant.name, "stage": "retry", "upstream": upstream, "attempt": attempts}
+        )
+        self.wakeup.set()
+        return True
+
+    def recovered(self, upstream: str):
+        self.recovered_upstreams.add(upstream)
+        self.wakeup.set()
+
+    async def release_due(self):
+        """Send due codes back to processing, returns when the next one is due or None"""
+        now = time.time()
+        recovered, self.recovered_upstreams = self.recovered_upstreams, set()
+        probing = set()
+        released = 0
+        next_due = None
+        store = self.tenant.store
+        for code in await store.codes_with_status("retrying"):
+            entry = await store.get(code)
+            upstream = entry.get("retry_upstream")
+            breaker = breakers.get(upstream)
+            due_at = now if upstream in recovered else entry.get("retry_at", 0)
+            if due_at <= now and breaker is not None and breaker.state != "closed":
+                if upstream in probing or not breaker.ready():
+                    # Wait for the probe to tell whether the upstream is back
+                    due_at = now + max(1.0, breaker.probe_at - time.monotonic())
+                else:
+                    probing.add(upstream)
+            if due_at <= now:
+                await store.update(code, retry_at=0)
+                released += 1
+            elif next_due is None or due_at < next_due:
+                next_due = due_at
+        
+        if released:
+            retries_total.inc(released, event="retried")
+            log.info(f"🔁 Retrying {released} deferred code(s)", extra={"tenant": self.tenant.name})
+            self.tenant.monitor.request_processing()
+        return next_due
+
+async def process_code(tenant, code: str) -> bool:
+    """Check one submitted code and grant the role, returns True if the code was processed"""
+    store = tenant.store
+    entry = await store.get(code)
+    # The code may have been removed by /cleanup while others were processed
+    if entry is None or get_code_status(entry) != "submitted":
+        return False
+    
+    minecraft_username = entry.get("minecraft_username")
+    discord_user_id = entry.get("discord_user_id")
+    
+    fields = {"code": code, "tenant": tenant.name, "discord_user_id": discord_user_id, "minecraft_username": minecraft_username}
+    if not discord_user_id:
+        log.warning(f"⚠️ Code {code} has no discord_user_id, skipping", extra=fields)
+        return False
+    if not isinstance(minecraft_username, str) or not minecraft_username.strip():
+        # Nothing to look up, mark it failed rather than leave it submitted forever
+        log.warning(f"❌ Code {code} has no Minecraft username", extra={**fields, "stage": "lookup"})
+        await store.update(code, processed=True, error="Missing Minecraft username")
+        verifications_total.inc(result="invalid_entry")
+        tenant.submission_seen_at.pop(code, None)
+        return True
+    
+    started = time.perf_counter()
+    log.debug(f"🔄 Processing verified code {code} for {minecraft_username}", extra={**fields, "stage": "start"})
+    
+    # Get Minecraft UUID
+    uuid_result = await get_minecraft_uuid(minecraft_username)
+    if not await store.contains(code):
+        return False
+    if not uuid_result["success"]:
+        if uuid_result.get("unavailable") and await tenant.retry_queue.defer(code, "mojang", uuid_result["error"]):
+            return True
+        log.warning(
+            f"❌ Failed to get UUID for {minecraft_username}: {uuid_result['error']}",
+            extra={**fields, "stage": "lookup", "duration": time.perf_counter() - started}
+        )
+        # Mark as processed anyway to avoid retrying
+        await store.update(code, processed=True, error=uuid_result["error"])
+        verifications_total.inc(result="unknown_account" if uuid_result.get("not_found") else "lookup_failed")
+        tenant.submission_seen_at.pop(code, None)
+        return True
+    
+    uuid = uuid_result["uuid"]
+    correct_name = uuid_result["name"]
+    
+    # Check guild membership
+    guild_result = await check_guild_membership(tenant, uuid)
+    if not await store.contains(code):
+        return False
+    if guild_result.get("unavailable") and await tenant.retry_queue.defer(code, "hypixel", guild_result["error"]):
+        return True
+    
+    # Mark as processed, the role and DMs are handed to the outbound queue
+    fields.update(minecraft_username=correct_name, stage="guild_check", duration=time.perf_counter() - started)
+    if not guild_result["success"]:
+        # Not in the guild
+        log.warning(f"❌ Guild check failed for {correct_name}: {guild_result['error']}", extra=fields)
+        await store.update(code, processed=True, guild_verified=False, error=guild_result["error"])
+        verifications_total.inc(result="not_in_guild")
+        tenant.submission_seen_at.pop(code, None)
+        discord_actions.submit(
+            "dms", tenant, code,
+            lambda: send_failure_dm(tenant, discord_user_id, correct_name, guild_result["error"])
+        )
+    else:
+        # Player is in the guild - assign verified role
+        await store.update(
+            code,
+            processed=True,
+            guild_verified=True,
+            verified_at=datetime.now(timezone.utc).isoformat(),
+            guild_name=guild_result.get("guild_name"),
+            minecraft_uuid=uuid
+        )
+        verifications_total.inc(result="verified")
+        log.info(f"🎮 {correct_name} is in {guild_result.get('guild_name')}, queued the verified role", extra=fields)
+        discord_actions.submit(
+            "roles", tenant, code,
+            lambda: grant_verified_role(tenant, code, discord_user_id, uuid, correct_name, guild_result.get("guild_name"))
+        )
+    
+    return True
+
+async def process_verified_codes(tenant):
+    """Process the tenant's codes that have been set to verified: true by Minecraft plugin"""
+    try:
+        # Codes verified by Minecraft plugin but not processed yet
+        codes = await tenant.store.codes_with_status("submitted")
+        if not codes:
+            return False
+        started = time.perf_counter()
+        seen_at = time.time()
+        for code in codes:
+            tenant.submission_seen_at.setdefault(code, seen_at)
+        
+        # A fixed number of workers share the batch, so a burst of submissions
+        # waits on VERIFICATION_CONCURRENCY round-trips at a time rather than one
+        pending = iter(codes)
+        processed = []
+        
+        async def worker():
+            for code in pending:
+                try:
+                    if await process_code(tenant, code):
+                        processed.append(code)
+                except Exception as e:
+                    log.exception(f"❌ Error processing code {code}: {e}", extra={"code": code, "tenant": tenant.name, "stage": "processing"})
+                    errors_total.inc(category="processing")
+        
+        await asyncio.gather(*(worker() for _ in range(min(VERIFICATION_CONCURRENCY, len(codes)))))
+        
+        # Persist the whole batch at once
+        if processed:
+            await tenant.store.save()
+        process_tick_latency.observe(time.perf_counter() - started)
+        process_batch_size.observe(len(codes))
+        return bool(processed)
+        
+    except Exception as e:
+        log.error(f"❌ Error processing verified codes: {e}", extra={"tenant": tenant.name})
+        errors_total.inc(category="processing")
+        return False
+
+# ==================== DISCORD ACTIONS ====================
+async def get_guild_member(discord_guild, user_id: int):
+    """Return a member from the client cache, member_cache or the API, or None if not in the server.
+
+    Transient API errors are raised so queued actions retry them.
+    """
+    member = discord_guild.get_member(user_id)
+    if member:
+        return member
+    key = (discord_guild.id, user_id)
+    cached = member_cache.get(key)
+    if cached is not None:
+        return cached or None
+    try:
+        member = await discord_guild.fetch_member(user_id)
+    except discord.NotFound:
+        member_cache.set(key, False, ttl=MEMBER_NEGATIVE_CACHE_TTL)
+        return None
+    member_cache.set(key, member)
+    return member
+
+async def resolve_member_names(tenant, user_ids) -> dict:
+    """Map Discord user ids to member names in the tenant's server, querying the ones not cached in batches of 100"""
+    guild_id = tenant.discord_guild_id
+    names = {}
+    missing = []
+    for user_id in user_ids:
+        name = member_name_cache.get((guild_id, user_id))
+        if name is not None:
+            names[user_id] = name
+        elif user_id and user_id.isdigit():
+            missing.append(int(user_id))
+    
+    discord_guild = bot.get_guild(guild_id)
+    if not missing or not discord_guild:
+        return names
+    
+    unresolved = []
+    for user_id in missing:
+        member = discord_guild.get_member(user_id) or member_cache.get((guild_id, user_id))
+        if member:
+            names[str(user_id)] = member.name
+            member_name_cache.set((guild_id, str(user_id)), member.name)
+        else:
+            unresolved.append(user_id)
+    
+    for i in range(0, len(unresolved), 100):
+        batch = unresolved[i:i + 100]
+        try:
+            members = await discord_guild.query_members(user_ids=batch, limit=len(batch))
+        except Exception as e:
+            log.warning(f"⚠️ Could not resolve member names: {e}")
+            break
+        found = {member.id: member.name for member in members}
+        for user_id in batch:
+            # Users who left are remembered as "" so they aren't queried on every page
+            name = found.get(user_id, "")
+            names[str(user_id)] = name
+            member_name_cache.set((guild_id, str(user_id)), name)
+    return names
+
+def is_transient_discord_error(e: Exception) -> bool:
+    """Rate limits, Discord server errors and network problems are worth retrying"""
+    if isinstance(e, discord.HTTPException):
+        return e.status == 429 or e.status >= 500
+    return isinstance(e, (asyncio.TimeoutError, aiohttp.ClientError, OSError))
+
+async def grant_verified_role(tenant, code: str, discord_user_id: str, uuid: str, correct_name: str, guild_name: str) -> dict:
+    """Give the member the tenant's verified role and queue the success DM if the role was new"""
+    discord_guild = bot.get_guild(tenant.discord_guild_id)
+    if not discord_guild:
+        log.error(f"❌ Discord guild not found (ID: {tenant.discord_guild_id})", extra={"tenant": tenant.name})
+        return {"error": "Discord guild not found"}
+    
+    fields = {"code": code, "tenant": tenant.name, "discord_user_id": discord_user_id, "minecraft_username": correct_name, "stage": "role"}
+    member = await get_guild_member(discord_guild, int(discord_user_id))
+    if not member:
+        log.error(f"❌ Discord member not found (ID: {discord_user_id})", extra=fields)
+        return {"error": "Discord member not found in server"}
+    
+    role = discord_guild.get_role(tenant.verified_role_id)
+    if not role:
+        log.error(f"❌ Verified role not found (ID: {tenant.verified_role_id})", extra=fields)
+        return {"error": "Verified role not found"}
+    
+    # A requeued grant after a restart finds the role already there, its DM went out with the first grant
+    role_added = role not in member.roles
+    try:
+        if role_added:
+            await member.add_roles(role)
+            # The cached member's roles are now stale
+            member_cache.pop((discord_guild.id, member.id))
+            log.info(f"✅ Successfully assigned verified role to {member.name} for Minecraft account {correct_name}", extra=fields)
+        else:
+            log.info(f"ℹ️ {member.name} already has the verified role", extra=fields)
+    except discord.Forbidden:
+        error_msg = "Bot missing permissions to add role"
+        log.error(f"❌ {error_msg}", extra=fields)
+        return {"error": error_msg}
+    except Exception as e:
+        if is_transient_discord_error(e):
+            raise
+        error_msg = f"Error assigning role: {str(e)}"
+        log.error(f"❌ {error_msg}", extra=fields)
+        return {"error": error_msg}
+    
+    tenant.verified_members.record(discord_user_id, uuid, correct_name)
+    if role_added:
+        discord_actions.submit("dms", tenant, code, lambda: send_success_dm(member, code, correct_name, guild_name, role))
+    return {"role_granted": True}
+
+async def send_success_dm(member, code: str, correct_name: str, guild_name: str, role) -> dict:
+    embed = discord.Embed(
+        title="✅ Verification Complete!",
+        description=f"Your Minecraft account **{correct_name}** has been verified!",
+        color=discord.Color.green()
+    )
+    embed.add_field(
+        name="Guild Membership",
+        value=f"You are a member of **{guild_name}**",
+        inline=False
+    )
+    embed.add_field(
+        name="Role Granted",
+        value=f"You have been granted the {role.mention} role",
+        inline=False
+    )
+    embed.set_footer(text=f"Verification code: {code}")
+    return await send_dm(member, embed)
+
+async def send_failure_dm(tenant, discord_user_id: str, correct_name: str, reason: str) -> dict:
+    discord_guild = bot.get_guild(tenant.discord_guild_id)
+    member = await get_guild_member(discord_guild, int(discord_user_id)) if discord_guild else None
+    if not member:
+        return {"dm_sent": False}
+    
+    embed = discord.Embed(
+        title="❌ Verification Failed",
+        description=f"Your Minecraft account **{correct_name}** could not be verified.",
+        color=discord.Color.red()
+    )
+    embed.add_field(
+        name="Reason",
+        value=reason,
+        inline=False
+    )
+    embed.add_field(
+        name="What to do",
+        value="1. Make sure you're in the correct Hypixel guild\n2. Try the verification process again",
+        inline=False
+    )
+    return await send_dm(member, embed)
+
+async def send_dm(member, embed) -> dict:
+    try:
+        await member.send(embed=embed)
+        return {"dm_sent": True}
+    except Exception as e:
+        if is_transient_discord_error(e):
+            raise
+        # Usually the member has DMs closed, nothing to retry
+        log.warning(f"⚠️ Could not send DM to {member.name}: {e}")
+        return {"dm_sent": False}
+
+class DiscordActionQueue:
+    """Outbound queue for role grants and DMs, so the verification loop never waits on Discord.
+
+    Actions are grouped by route ("roles", "dms", "sweep"), each with its own queue and
+    workers, so a slow or closed DM can't hold up role grants. Transient failures are
+    retried with exponential backoff, and the fields an action returns are recorded
+    on the code's entry once it finishes, to be saved with the store's next write.
+    A route can be paced to a maximum rate.
+    """
+    def __init__(self, workers_per_route: int, max_attempts: int, rates: dict = None):
+        self.workers_per_route = workers_per_route
+        self.max_attempts = max_attempts
+        self.rates = rates or {}  # route -> maximum actions per second
+        self.queues = {}  # route -> asyncio.Queue of (tenant, code, action)
+        self.workers = []
+        self.unsaved = set()  # Tenants with action errors recorded on their store but not saved yet
+
+    def submit(self, route: str, tenant, code: str, action):
+        """Queue an action, an async callable returning fields to set on the code's entry in the tenant's store"""
+        queue = self.queues.get(route)
+        if queue is None:
+            queue = self.queues[route] = asyncio.Queue()
+            for _ in range(self.workers_per_route):
+                self.workers.append(asyncio.create_task(self._worker(route, queue)))
+        queue.put_nowait((tenant, code, action))
+
+    def depth(self) -> dict:
+        return {route: queue.qsize() for route, queue in self.queues.items()}
+
+    async def _worker(self, route: str, queue: asyncio.Queue):
+        rate = self.rates.get(route)
+        # Each worker takes its share of the route's rate
+        interval = self.workers_per_route / rate if rate else 0
+        while True:
+            tenant, code, action = await queue.get()
+            try:
+                with discord_action_latency.time(route=route):
+                    fields = await self._run(route, code, action)
+                if route == "roles":
+                    seen_at = tenant.submission_seen_at.pop(code, None)
+                    if seen_at is not None and fields and fields.get("role_granted"):
+                        submission_to_role_latency.observe(time.time() - seen_at)
+                if fields and fields.get("error"):
+                    errors_total.inc(category="discord")
+                if fields and code is not None and await tenant.store.contains(code):
+                    # Outcomes ride along with the next batch save or compaction, a grant lost
+                    # before that is queued again on start. Only errors are worth a write of their own.
+                    await tenant.store.update(code, **fields)
+                    if fields.get("error"):
+                        self.unsaved.add(tenant)
+                # Persist errors once the route has caught up
+                if queue.empty() and self.unsaved:
+                    unsaved, self.unsaved = self.unsaved, set()
+                    for unsaved_tenant in unsaved:
+                        await unsaved_tenant.store.save()
+            except Exception as e:
+                log.error(f"❌ Error in {route} action for code {code}: {e}", extra={"code": code, "tenant": tenant.name, "stage": route})
+                errors_total.inc(category="discord")
+            finally:
+                queue.task_done()
+            if interval:
+                await asyncio.sleep(interval)
+
+    async def _run(self, route: str, code: str, action) -> dict:
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                return await action()
+            except Exception as e:
+                if not is_transient_discord_error(e):
+                    raise
+                if attempt == self.max_attempts:
+                    log.error(
+                        f"❌ {route} action for code {code} failed after {attempt} attempts: {e}",
+                        extra={"code": code, "stage": route, "attempt": attempt}
+                    )
+                    return {"error": f"Discord {route} action failed: {e or type(e).__name__}"}
+                
+                retry_after = getattr(e, "retry_after", None)
+                delay = retry_after or min(60, DISCORD_ACTION_RETRY_DELAY * 2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
+                log.warning(
+                    f"⏳ {route} action for code {code} failed ({e or type(e).__name__}), retrying in {delay:.1f}s",
+                    extra={"code": code, "stage": route, "attempt": attempt}
+                )
+                await asyncio.sleep(delay)
+
+    async def drain(self, routes: tuple, timeout: float) -> bool:
+        """Wait until the given routes have finished their actions, returns False if the timeout ran out"""
+        deadline = time.monotonic() + timeout
+        # In order, finished role grants queue their DMs
+        for route in routes:
+            queue = self.queues.get(route)
+            if queue is None:
+                continue
+            try:
+                await asyncio.wait_for(queue.join(), timeout=max(0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                log.warning(f"⚠️ {route} actions still running after {timeout:g}s, unfinished role grants are queued again on the next start")
+                return False
+        return True
+
+    def stop(self):
+        for worker in self.workers:
+            worker.cancel()
+        self.workers = []
+        self.queues = {}
+
+discord_actions = DiscordActionQueue(DISCORD_ACTION_WORKERS, DISCORD_ACTION_MAX_ATTEMPTS, {"sweep": ROLE_SWEEP_RATE})
+
+async def requeue_role_grants(tenant) -> int:
+    """Queue the role again for verified codes whose grant never finished, e.g. when the bot was stopped.
+
+    Verified entries are saved as soon as the guild check passes, while the grant itself
+    only lives in the action queue, so an entry with neither role_granted nor an error
+    was lost on the way. Returns how many grants were queued.
+    """
+    await bot.wait_until_ready()
+    requeued = 0
+    for code in await tenant.store.codes_with_status("verified"):
+        entry = await tenant.store.get(code)
+        discord_user_id = entry.get("discord_user_id")
+        uuid = entry.get("minecraft_uuid")
+        if entry.get("role_granted") or entry.get("error") or not discord_user_id or not uuid:
+            continue
+        discord_actions.submit(
+            "roles", tenant, code,
+            lambda code=code, entry=entry, discord_user_id=discord_user_id, uuid=uuid: grant_verified_role(
+                tenant, code, discord_user_id, uuid, entry.get("minecraft_username"), entry.get("guild_name")
+            )
+        )
+        requeued += 1
+    if requeued:
+        log.info(f"🔁 Queued {requeued} unfinished role grant(s) again", extra={"tenant": tenant.name})
+    return requeued
+
+# ==================== ROLE SWEEP ====================
+class VerifiedMembers:
+    """Everyone the bot has verified, so their guild membership can be checked again later.
+
+    Kept in its own small JSON file (discord user id -> record) because verified codes
+    only stay in the verification file for VERIFICATION_RETENTION seconds.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.members = {}  # discord user id -> {"uuid", "minecraft_username", "verified_at", "active"}
+        self.dirty = False
+
+    def __len__(self):
+        return len(self.members)
+
+    async def load(self):
+        try:
+            self.members = await file_io.run(self.path, read_json_file, self.path)
+            log.info(f"✅ Loaded {len(self.members)} verified members from {self.path}")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            log.warning(f"⚠️ Could not load verified members from {self.path}: {e}")
+
+    async def save(self):
+        if not self.dirty:
+            return
+        # Records are small flat dicts changed in place by set_active, copy them for the I/O thread
+        snapshot = {discord_user_id: dict(record) for discord_user_id, record in self.members.items()}
+        self.dirty = False
+        try:
+            await file_io.run(self.path, write_json_file, self.path, snapshot)
+        except Exception as e:
+            self.dirty = True
+            log.error(f"❌ Error saving verified members: {e}")
+
+    def record(self, discord_user_id: str, uuid: str, minecraft_username: str, verified_at: str = None):
+        self.members[discord_user_id] = {
+            "uuid": normalize_uuid(uuid),
+            "minecraft_username": minecraft_username,
+            "verified_at": verified_at or datetime.now(timezone.utc).isoformat(),
+            "active": True
+        }
+        self.dirty = True
+
+    def set_active(self, discord_user_id: str, active: bool):
+        record = self.members.get(discord_user_id)
+        if record is not None and record["active"] != active:
+            record["active"] = active
+            self.dirty = True
+
+async def adopt_verified_codes(tenant) -> int:
+    """Record verified codes still on file that predate the registry, returns how many were added"""
+    adopted = 0
+    for code in await tenant.store.codes_with_status("verified"):
+        entry = await tenant.store.get(code)
+        discord_user_id = entry.get("discord_user_id")
+        if not discord_user_id or discord_user_id in tenant.verified_members.members:
+            continue
+        uuid = entry.get("minecraft_uuid")
+        name = entry.get("minecraft_username")
+        if not uuid:
+            # Older entries only have the name, lookups are batched and cached
+            result = await get_minecraft_uuid(name)
+            if not result["success"]:
+                continue
+            uuid, name = result["uuid"], result["name"]
+        tenant.verified_members.record(discord_user_id, uuid, name, entry.get("verified_at"))
+        adopted += 1
+    return adopted
+
+async def set_verified_role(tenant, discord_user_id: str, grant: bool) -> dict:
+    """Add or remove the verified role for a sweep, recording the outcome in the registry"""
+    discord_guild = bot.get_guild(tenant.discord_guild_id)
+    role = discord_guild.get_role(tenant.verified_role_id) if discord_guild else None
+    if not role:
+        return {}
+    
+    member = await get_guild_member(discord_guild, int(discord_user_id))
+    if not member:
+        # Left the Discord server, so they hold no role. A restore stays pending for
+        # on_member_join, or for the next sweep once they are back.
+        if not grant:
+            tenant.verified_members.set_active(discord_user_id, False)
+        return {}
+    
+    try:
+        if grant and role not in member.roles:
+            await member.add_roles(role, reason="Back in the Hypixel guild")
+            member_cache.pop((discord_guild.id, member.id))
+            log.info(f"✅ Restored verified role for {member.name}")
+        elif not grant and role in member.roles:
+            await member.remove_roles(role, reason="No longer in the Hypixel guild")
+            member_cache.pop((discord_guild.id, member.id))
+            log.info(f"🚫 Removed verified role from {member.name}")
+    except discord.Forbidden:
+        log.error(f"❌ Bot missing permissions to change the role of {member.name}")
+        return {}
+    tenant.verified_members.set_active(discord_user_id, grant)
+    return {}
+
+async def sweep_verified_roles(tenant) -> dict:
+    """Diff the tenant's Hypixel guild roster against every member it verified and fix their roles.
+
+    Costs one roster request plus Mojang lookups only for entries that predate the
+    registry, whatever the number of verified members.
+    """
+    verified_members = tenant.verified_members
+    roster = tenant.roster
+    await adopt_verified_codes(tenant)
+    if not verified_members.members:
+        return {"revoked": 0, "restored": 0}
+    
+    if not await roster.refresh(force=True, priority=PRIORITY_BACKGROUND):
+        return {"revoked": 0, "restored": 0}
+    # An empty roster is far more likely an API hiccup than a guild everyone left
+    if not roster.members:
+        log.warning("⚠️ Guild roster is empty, skipping the role sweep", extra={"tenant": tenant.name})
+        return {"revoked": 0, "restored": 0}
+    
+    revoke = []
+    restore = []
+    for discord_user_id, record in verified_members.members.items():
+        in_guild = record["uuid"] in roster.members
+        if record["active"] and not in_guild:
+            revoke.append(discord_user_id)
+        elif not record["active"] and in_guild:
+            restore.append(discord_user_id)
+    
+    for discord_user_id in revoke:
+        discord_actions.submit("sweep", tenant, None, lambda discord_user_id=discord_user_id: set_verified_role(tenant, discord_user_id, False))
+    for discord_user_id in restore:
+        discord_actions.submit("sweep", tenant, None, lambda discord_user_id=discord_user_id: set_verified_role(tenant, discord_user_id, True))
+    role_sweep_changes.inc(len(revoke), action="revoke")
+    role_sweep_changes.inc(len(restore), action="restore")
+    if revoke or restore:
+        log.info(
+            f"🔍 Role sweep: {len(revoke)} to revoke, {len(restore)} to restore out of {len(verified_members)} verified members",
+            extra={"tenant": tenant.name}
+        )
+        await discord_actions.queues["sweep"].join()
+    await verified_members.save()
+    return {"revoked": len(revoke), "restored": len(restore)}
+
+# ==================== VERIFICATION STORE ====================
+CODE_STATUSES = ("pending", "submitted", "retrying", "verified", "failed")
+
+def get_code_deadline(entry: dict) -> float:
+    """Timestamp at which a code expires: its TTL while pending, the retention period after that"""
+    ttl = VERIFICATION_CODE_TTL if get_code_status(entry) == "pending" else VERIFICATION_RETENTION
+    return entry.get("timestamp", 0) + ttl
+
+def get_code_status(entry: dict) -> str:
+    """Classify a code entry as pending, submitted, retrying, verified or failed"""
+    if not entry.get("verified", False):
+        return "pending"  # Not submitted in Minecraft yet
+    if not entry.get("processed", False):
+        if entry.get("retry_at"):
+            return "retrying"  # Deferred while Mojang or Hypixel was down
+        return "submitted"  # Submitted in Minecraft, waiting for the bot
+    if entry.get("guild_verified"):
+        return "verified"
+    return "failed"
+
+class VerificationStore:
+    """In-memory copy of the verification file with indexes by user and status.
+
+    The store is the bot's source of truth, commands read it without touching the
+    disk. Outside writes from the Minecraft plugin are merged in by refresh(): the
+    plugin only ever flips verified to true, so that is the one field taken from
+    the file for codes the store already knows. The methods are coroutines like
+    SQLiteVerificationStore's, only reloads, saves and scans of the whole store
+    ever give way to other tasks.
+    """
+    def __init__(self, path: str, mode: str = "snapshot", journal_path: str = None, allocator: "CodeAllocator" = None):
+        self.path = path
+        self.mode = mode  # snapshot rewrites the file on every save, journal appends changes and compacts later
+        self.journal_path = journal_path or path + ".journal"
+        self.allocator = allocator or CodeAllocator(VERIFICATION_CODE_LENGTH, VERIFICATION_CODE_COOLDOWN)
+        self.loaded = False
+        self.fingerprint = FileFingerprint(path, VERIFICATION_CONTENT_HASH)  # File state at the last load or save
+        self.entries = {}  # code -> entry
+        self.by_user = {}  # discord_user_id -> {code: None}, oldest first
+        self.by_status = {status: {} for status in CODE_STATUSES}  # status -> {code: None}
+        self.deadlines = []  # heap of (expiry timestamp, code), may hold stale items
+        self.removed = set()  # Codes removed since the last compaction, not to be re-adopted from the file
+        self.dirty = {}  # Codes changed since the last save, in change order
+        self.codes_added_or_removed = False  # The plugin needs the file rewritten to see these, unlike other changes
+        self.journal_records = 0  # Records appended since the last compaction
+        self.compaction_handle = None
+        self.compaction_task = None
+        self.lock = asyncio.Lock()  # Serializes reloads and compactions, which await file I/O
+        self.on_submitted = None  # Called when a refresh finds newly submitted codes
+
+    def __len__(self):
+        return len(self.entries)
+
+    async def contains(self, code: str) -> bool:
+        return code in self.entries
+
+    async def get(self, code: str):
+        return self.entries.get(code)
+
+    async def codes_for_user(self, discord_user_id: str) -> list:
+        """All codes of a user, oldest first"""
+        return list(self.by_user.get(discord_user_id, ()))
+
+    async def active_code_for_user(self, discord_user_id: str):
+        """Return the user's code that hasn't been processed yet, or None"""
+        for code in self.by_user.get(discord_user_id, ()):
+            if get_code_status(self.entries[code]) in ("pending", "submitted", "retrying"):
+                return code
+        return None
+
+    async def codes_with_status(self, status: str, limit: int = None, offset: int = 0) -> list:
+        stop = None if limit is None else offset + limit
+        return list(itertools.islice(self.by_status[status], offset, stop))
+
+    def count(self, status: str) -> int:
+        return len(self.by_status[status])
+
+    def _index(self, code: str, entry: dict):
+        self.entries[code] = entry
+        user_id = entry.get("discord_user_id")
+        if user_id:
+            self.by_user.setdefault(user_id, {})[code] = None
+        self.by_status[get_code_status(entry)][code] = None
+        heapq.heappush(self.deadlines, (get_code_deadline(entry), code))
+        self.allocator.reserve(code)
+
+    def _unindex(self, code: str):
+        entry = self.entries.pop(code)
+        user_id = entry.get("discord_user_id")
+        user_codes = self.by_user.get(user_id)
+        if user_codes is not None:
+            user_codes.pop(code, None)
+            if not user_codes:
+                del self.by_user[user_id]
+        self.by_status[get_code_status(entry)].pop(code, None)
+        self.allocator.release(code)
+        return entry
+
+    async def add(self, code: str, entry: dict):
+        if code in self.entries:
+            self._unindex(code)
+        else:
+            self.codes_added_or_removed = True
+        self._index(code, entry)
+        self.removed.discard(code)
+        self.dirty[code] = None
+
+    async def update(self, code: str, **fields):
+        """Update fields of an existing code, keeping the indexes in sync"""
+        entry = self.entries[code]
+        old_status = get_code_status(entry)
+        entry.update(fields)
+        new_status = get_code_status(entry)
+        if new_status != old_status:
+            del self.by_status[old_status][code]
+            self.by_status[new_status][code] = None
+            # The old heap item goes stale and is skipped when it comes up
+            heapq.heappush(self.deadlines, (get_code_deadline(entry), code))
+        self.dirty[code] = None
+
+    async def remove(self, code: str):
+        return self._remove(code)
+
+    def _remove(self, code: str):
+        if code in self.entries:
+            self.removed.add(code)
+            self.dirty[code] = None
+            self.codes_added_or_removed = True
+            return self._unindex(code)
+        return None
+
+    async def remove_older_than(self, cutoff: float) -> int:
+        """Remove codes created before the cutoff timestamp, returns how many were removed"""
+        removed = 0
+        codes = list(self.entries)
+        for start in range(0, len(codes), VERIFICATION_BATCH_SIZE):
+            for code in codes[start:start + VERIFICATION_BATCH_SIZE]:
+                entry = self.entries.get(code)
+                if entry is not None and entry.get("timestamp", 0) < cutoff:
+                    self._remove(code)
+                    removed += 1
+            # A large store takes a while to go through, let other tasks run in between
+            await asyncio.sleep(0)
+        return removed
+
+    def _is_stale(self, deadline: float, code: str) -> bool:
+        entry = self.entries.get(code)
+        return entry is None or get_code_deadline(entry) != deadline
+
+    async def next_deadline(self):
+        """Earliest expiry time of any code, or None if the store is empty"""
+        while self.deadlines and self._is_stale(*self.deadlines[0]):
+            heapq.heappop(self.deadlines)
+        return self.deadlines[0][0] if self.deadlines else None
+
+    async def expire(self, now: float) -> list:
+        """Remove every code whose deadline has passed, returns the removed (code, entry) pairs"""
+        expired = []
+        while self.deadlines and self.deadlines[0][0] <= now:
+            deadline, code = heapq.heappop(self.deadlines)
+            if not self._is_stale(deadline, code):
+                expired.append((code, self._remove(code)))
+        return expired
+
+    async def refresh(self) -> bool:
+        """Merge in outside writes if the file changed since the last load or save"""
+        async with self.lock:
+            return await self._refresh()
+
+    async def _refresh(self) -> bool:
+        first_load = not self.loaded
+        self.loaded = True
+
+        changed = await self.fingerprint.check()
+        if changed:
+            # The file is parsed and compared with the store on its I/O thread, only the
+            # codes that changed come back to be merged here on the loop
+            data = await file_io.run(self.path, load_verification_codes, self.path, self._is_news)
+
+            submitted = []
+            records_changed = 0
+            for count, (code, disk_entry) in enumerate(data.items(), 1):
+                if count % VERIFICATION_BATCH_SIZE == 0:
+                    # The first load takes in every code, let other tasks run in between
+                    await asyncio.sleep(0)
+                # The store may have changed since the I/O thread looked, so check again
+                entry = self.entries.get(code)
+                if code in self.removed:
+                    continue
+                if entry is None:
+                    self._index(code, disk_entry)
+                    records_changed += 1
+                    if get_code_status(disk_entry) == "submitted":
+                        submitted.append(code)
+                elif disk_entry.get("verified", False) and not entry.get("verified", False):
+                    await self.update(code, verified=True)
+                    records_changed += 1
+                    submitted.append(code)
+            record_reload(self.path, records_changed)
+
+            if submitted and self.on_submitted:
+                self.on_submitted()
+
+        if first_load and self.mode == "journal":
+            await self._replay_journal()
+        return changed
+
+    def _is_news(self, code: str, disk_entry: dict) -> bool:
+        """Whether the file's entry for code has anything the store lacks.
+
+        Runs on the file's I/O thread while the loop goes on using the store, which is safe
+        as long as it only makes single lookups.
+        """
+        if code in self.removed:
+            return False
+        entry = self.entries.get(code)
+        return entry is None or (disk_entry.get("verified", False) and not entry.get("verified", False))
+
+    async def _replay_journal(self):
+        """Apply changes journaled after the last compaction on top of the JSON file"""
+        records = await file_io.run(self.journal_path, load_journal, self.journal_path)
+        for record in records:
+            code = record.get("code")
+            if record.get("op") == "put":
+                # Deleted earlier in the journal and issued again, the file's copy is wanted again
+                self.removed.discard(code)
+                entry = self.entries.get(code)
+                if entry is None:
+                    self._index(code, record["entry"])
+                else:
+                    # The plugin may have verified the code after the change was journaled
+                    verified = entry.get("verified", False) or record["entry"].get("verified", False)
+                    await self.update(code, **dict(record["entry"], verified=verified))
+            elif record.get("op") == "del" and code in self.entries:
+                self._unindex(code)
+                self.removed.add(code)
+
+        self.dirty.clear()
+        if records:
+            log.info(f"📒 Replayed {len(records)} journal record(s) from {self.journal_path}")
+            self._schedule_compaction(VERIFICATION_COMPACT_DELAY)
+
+    async def save(self) -> bool:
+        """Persist changes made since the last save"""
+        if self.mode != "journal":
+            return await self.compact()
+        if not self.dirty:
+            return True
+
+        # Each changed code costs one small journal line, whatever the size of the store.
+        # Entries are flat, so a shallow copy is a snapshot the I/O thread can serialize
+        # while the loop keeps changing the store.
+        dirty, self.dirty = self.dirty, {}
+        records = self._journal_records(dirty)
+        if not await file_io.run(self.journal_path, append_journal, self.journal_path, records):
+            self.dirty = {**dirty, **self.dirty}
+            return False
+        self.journal_records += len(records)
+
+        # The plugin only reads the file to find codes, so it needs a prompt rewrite when codes
+        # come or go. Other changes wait for the journal to grow or for the long timer.
+        if self.codes_added_or_removed or self.journal_records >= VERIFICATION_COMPACT_RECORDS:
+            self._schedule_compaction(VERIFICATION_COMPACT_DELAY)
+        else:
+            self._schedule_compaction(VERIFICATION_COMPACT_INTERVAL)
+        return True
+
+    def _journal_records(self, codes) -> list:
+        """Journal records with the current state of the given codes"""
+        records = []
+        for code in codes:
+            entry = self.entries.get(code)
+            if entry is None:
+                records.append({"op": "del", "code": code})
+            else:
+                records.append({"op": "put", "code": code, "entry": dict(entry)})
+        return records
+
+    def _schedule_compaction(self, delay: float):
+        """Compact after delay seconds, unless a compaction is already due sooner"""
+        loop = asyncio.get_running_loop()
+        if self.compaction_handle is not None:
+            if self.compaction_handle.when() <= loop.time() + delay:
+                return
+            self.compaction_handle.cancel()
+        self.compaction_handle = loop.call_later(delay, self._start_compaction)
+
+    def _start_compaction(self):
+        self.compaction_handle = None
+        self.compaction_task = asyncio.create_task(self.compact())
+
+    async def compact(self) -> bool:
+        """Write the whole store to the JSON file the plugin reads and clear the journal"""
+        if self.compaction_handle is not None:
+            self.compaction_handle.cancel()
+            self.compaction_handle = None
+
+        async with self.lock:
+            # Pick up plugin writes first so they aren't overwritten
+            await self._refresh()
+
+            # The I/O thread writes the live entries, copying each as it gets to it. Changes
+            # made from here on may or may not make it into the file, so they are left
+            # dirty for the next save.
+            dirty, self.dirty = self.dirty, {}
+            removed, self.removed = self.removed, set()
+            added_or_removed, self.codes_added_or_removed = self.codes_added_or_removed, False
+            journal_records, self.journal_records = self.journal_records, 0
+            saved = True
+            if self.mode == "journal":
+                # Queued ahead of any append made during the write, which go to a fresh journal
+                saved = await file_io.run(self.journal_path, rotate_journal, self.journal_path, self._journal_records(dirty))
+
+            written = None
+            if saved:
+                written = await file_io.run(self.path, save_verification_codes, self.path, self.entries, self.fingerprint.use_hash)
+                saved = written is not None
+            if saved:
+                self.fingerprint.record(*written)
+                if self.mode == "journal":
+                    await file_io.run(self.journal_path, remove_rotated_journal, self.journal_path)
+            else:
+                self.dirty = {**dirty, **self.dirty}
+                self.removed |= removed
+                self.codes_added_or_removed |= added_or_removed
+                self.journal_records += journal_records
+            return saved
+
+    async def close(self):
+        # Make sure journaled changes reach the file the plugin reads
+        if self.compaction_handle is not None or self.dirty:
+            await self.compact()
+        elif self.compaction_task is not None:
+            await self.compaction_task
+
+class SQLiteVerificationStore:
+    """VerificationStore backed by SQLite, for stores too large to keep in memory.
+
+    All codes live in the database. The JSON file only holds a view of the live
+    (pending and submitted) codes for the Minecraft plugin, which is exported on
+    save and read back by refresh() to pick up codes the plugin has verified. Codes
+    in the file the database doesn't know, e.g. issued before switching to SQLite
+    without running migrate_to_sqlite.py, are imported so the next export keeps them.
+
+    The connection is opened and used only on the database's own file_io thread, so
+    queries, JSON encoding of entries and commits never run on the event loop. The
+    methods starting with an underscore run on that thread.
+    """
+    LIVE_STATUSES = ("pending", "submitted", "retrying")
+
+    def __init__(self, db_path: str, path: str, allocator: "CodeAllocator" = None):
+        self.db_path = db_path
+        self.path = path  # JSON view shared with the plugin
+        self.allocator = allocator or CodeAllocator(VERIFICATION_CODE_LENGTH, VERIFICATION_CODE_COOLDOWN)
+        self.fingerprint = FileFingerprint(path, VERIFICATION_CONTENT_HASH)
+        self.on_submitted = None
+        self.opened = False
+        self.db = None
+        # Status counts are kept in memory so count() and len() never query, only the I/O thread changes them
+        self.counts = {status: 0 for status in CODE_STATUSES}
+        self.view_dirty = False  # Live codes changed since the last export
+        self.removed = set()  # Codes removed since the last export, not to be imported again from the file
+        self.lock = asyncio.Lock()  # Serializes reloads and exports, which await file I/O
+
+    async def open(self):
+        """Open the database on its I/O thread and reserve the codes it holds"""
+        if self.opened:
+            return
+        self.opened = True
+        codes = await file_io.run(self.db_path, self._open)
+        for code in codes:
+            self.allocator.reserve(code)
+
+    def _open(self) -> list:
+        self.db = sqlite3.connect(self.db_path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS codes (
+                code TEXT PRIMARY KEY,
+                discord_user_id TEXT,
+                status TEXT NOT NULL,
+                timestamp INTEGER NOT NULL DEFAULT 0,
+                entry TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_codes_user ON codes (discord_user_id);
+            CREATE INDEX IF NOT EXISTS idx_codes_status ON codes (status);
+            CREATE INDEX IF NOT EXISTS idx_codes_timestamp ON codes (timestamp);
+            CREATE INDEX IF NOT EXISTS idx_codes_status_timestamp ON codes (status, timestamp);
+        """)
+        self._count()
+        return [code for code, in self.db.execute("SELECT code FROM codes")]
+
+    def _count(self):
+        counts = {status: 0 for status in CODE_STATUSES}
+        for status, count in self.db.execute("SELECT status, COUNT(*) FROM codes GROUP BY status"):
+            counts[status] = count
+        self.counts = counts
+
+    async def _run(self, fn, *args):
+        """Run fn(*args) on the database's I/O thread, behind earlier jobs"""
+        if not self.opened:
+            await self.open()
+        return await file_io.run(self.db_path, fn, *args)
+
+    def __len__(self):
+        return sum(self.counts.values())
+
+    async def contains(self, code: str) -> bool:
+        return await self._run(self._contains, code)
+
+    def _contains(self, code: str) -> bool:
+        return self.db.execute("SELECT 1 FROM codes WHERE code = ?", (code,)).fetchone() is not None
+
+    async def get(self, code: str):
+        return await self._run(self._get, code)
+
+    def _get(self, code: str):
+        row = self.db.execute("SELECT entry FROM codes WHERE code = ?", (code,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    async def codes_for_user(self, discord_user_id: str) -> list:
+        """All codes of a user, oldest first"""
+        return await self._run(self._codes_for_user, discord_user_id)
 
-# ==================== HELPER FUNCTIONS ====================
-def generate_code() -> str:
-    """Generate a random 6-digit verification code"""
-    return ''.join(random.choices(string.digits, k=6))
+    def _codes_for_user(self, discord_user_id: str) -> list:
+        rows = self.db.execute("SELECT code FROM codes WHERE discord_user_id = ? ORDER BY rowid", (discord_user_id,))
+        return [code for code, in rows]
 
-def load_verification_codes():
-    """Load verification codes from JSON file"""
-    try:
-        with open(VERIFICATION_FILE_PATH, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            print(f"✅ Loaded {len(data)} verification codes from {VERIFICATION_FILE_PATH}")
-            return data
-    except FileNotFoundError:
-        print(f"❌ Verification file not found at {VERIFICATION_FILE_PATH}")
-        return {}
-    except json.JSONDecodeError as e:
-        print(f"❌ Error parsing JSON: {e}")
-        return {}
-    except Exception as e:
-        print(f"❌ Error loading verification codes: {e}")
-        return {}
+    async def active_code_for_user(self, discord_user_id: str):
+        """Return the user's code that hasn't been processed yet, or None"""
+        return await self._run(self._active_code_for_user, discord_user_id)
 
-def save_verification_codes(data):
-    """Save verification codes to JSON file"""
-    try:
-        with open(VERIFICATION_FILE_PATH, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2)
-        print(f"✅ Saved {len(data)} verification codes to {VERIFICATION_FILE_PATH}")
+    def _active_code_for_user(self, discord_user_id: str):
+        row = self.db.execute(
+            "SELECT code FROM codes WHERE discord_user_id = ? AND status IN ('pending', 'submitted', 'retrying') ORDER BY rowid LIMIT 1",
+            (discord_user_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    async def codes_with_status(self, status: str, limit: int = None, offset: int = 0) -> list:
+        return await self._run(self._codes_with_status, status, limit, offset)
+
+    def _codes_with_status(self, status: str, limit: int, offset: int) -> list:
+        rows = self.db.execute(
+            "SELECT code FROM codes WHERE status = ? ORDER BY rowid LIMIT ? OFFSET ?",
+            (status, -1 if limit is None else limit, offset)
+        )
+        return [code for code, in rows]
+
+    def count(self, status: str) -> int:
+        return self.counts[status]
+
+    def _write(self, code: str, entry: dict, old_status: str = None):
+        status = get_code_status(entry)
+        self.db.execute(
+            "INSERT OR REPLACE INTO codes (code, discord_user_id, status, timestamp, entry) VALUES (?, ?, ?, ?, ?)",
+            (code, entry.get("discord_user_id"), status, int(entry.get("timestamp", 0)), json.dumps(entry))
+        )
+        if old_status is not None:
+            self.counts[old_status] -= 1
+        self.counts[status] += 1
+        if status in self.LIVE_STATUSES or old_status in self.LIVE_STATUSES:
+            self.view_dirty = True
+
+    def _insert_missing(self, code: str, entry: dict) -> bool:
+        """Insert a code unless the database already has it, returns True if it was inserted"""
+        status = get_code_status(entry)
+        cursor = self.db.execute(
+            "INSERT OR IGNORE INTO codes (code, discord_user_id, status, timestamp, entry) VALUES (?, ?, ?, ?, ?)",
+            (code, entry.get("discord_user_id"), status, int(entry.get("timestamp", 0)), json.dumps(entry))
+        )
+        if not cursor.rowcount:
+            return False
+        self.counts[status] += 1
         return True
-    except Exception as e:
-        print(f"❌ Error saving verification codes: {e}")
-        return False
 
-async def get_minecraft_uuid(username: str) -> dict:
-    """Get Minecraft UUID from username using Mojang API"""
-    async with aiohttp.ClientSession() as session:
+    def _status_of(self, code: str):
+        row = self.db.execute("SELECT status FROM codes WHERE code = ?", (code,)).fetchone()
+        return row[0] if row else None
+
+    async def add(self, code: str, entry: dict):
+        self.allocator.reserve(code)
+        # Entries are flat, a shallow copy can't be changed by the caller while it waits for the thread
+        await self._run(self._add, code, dict(entry))
+
+    def _add(self, code: str, entry: dict):
+        self._write(code, entry, self._status_of(code))
+        self.removed.discard(code)
+
+    async def update(self, code: str, **fields):
+        """Update fields of an existing code, keeping the status column in sync"""
+        await self._run(self._update, code, fields)
+
+    def _update(self, code: str, fields: dict):
+        entry = self._get(code)
+        if entry is None:
+            raise KeyError(code)
+        old_status = get_code_status(entry)
+        entry.update(fields)
+        self._write(code, entry, old_status)
+
+    async def remove(self, code: str):
+        entry = await self._run(self._remove, code)
+        if entry is not None:
+            self.allocator.release(code)
+        return entry
+
+    def _remove(self, code: str):
+        entry = self._get(code)
+        if entry is None:
+            return None
+        self.db.execute("DELETE FROM codes WHERE code = ?", (code,))
+        status = get_code_status(entry)
+        self.counts[status] -= 1
+        if status in self.LIVE_STATUSES:
+            self.view_dirty = True
+            self.removed.add(code)
+        return entry
+
+    async def remove_older_than(self, cutoff: float) -> int:
+        """Remove codes created before the cutoff timestamp, returns how many were removed"""
+        codes = await self._run(self._remove_older_than, cutoff)
+        for code in codes:
+            self.allocator.release(code)
+        return len(codes)
+
+    def _remove_older_than(self, cutoff: float) -> list:
+        rows = self.db.execute("SELECT code, status FROM codes WHERE timestamp < ?", (cutoff,)).fetchall()
+        for code, status in rows:
+            self.counts[status] -= 1
+            if status in self.LIVE_STATUSES:
+                self.view_dirty = True
+                self.removed.add(code)
+        if rows:
+            self.db.execute("DELETE FROM codes WHERE timestamp < ?", (cutoff,))
+        return [code for code, _ in rows]
+
+    def _ttl(self, status: str) -> int:
+        return VERIFICATION_CODE_TTL if status == "pending" else VERIFICATION_RETENTION
+
+    async def next_deadline(self):
+        """Earliest expiry time of any code, or None if the store is empty"""
+        return await self._run(self._next_deadline)
+
+    def _next_deadline(self):
+        deadlines = []
+        for status in CODE_STATUSES:
+            oldest = self.db.execute("SELECT MIN(timestamp) FROM codes WHERE status = ?", (status,)).fetchone()[0]
+            if oldest is not None:
+                deadlines.append(oldest + self._ttl(status))
+        return min(deadlines) if deadlines else None
+
+    async def expire(self, now: float) -> list:
+        """Remove every code whose deadline has passed, returns the removed (code, entry) pairs"""
+        expired = await self._run(self._expire, now)
+        for code, _ in expired:
+            self.allocator.release(code)
+        return expired
+
+    def _expire(self, now: float) -> list:
+        expired = []
+        for status in CODE_STATUSES:
+            rows = self.db.execute(
+                "SELECT code, entry FROM codes WHERE status = ? AND timestamp <= ?",
+                (status, now - self._ttl(status))
+            ).fetchall()
+            if not rows:
+                continue
+            self.db.executemany("DELETE FROM codes WHERE code = ?", [(code,) for code, _ in rows])
+            self.counts[status] -= len(rows)
+            if status in self.LIVE_STATUSES:
+                self.view_dirty = True
+                self.removed.update(code for code, _ in rows)
+            expired.extend((code, json.loads(entry)) for code, entry in rows)
+        return expired
+
+    async def import_codes(self, data: dict) -> int:
+        """Bulk insert codes from a verification_codes.json dict, returns how many were imported"""
+        imported = await self._run(self._import_codes, data)
+        for code in data:
+            self.allocator.reserve(code)
+        return imported
+
+    def _import_codes(self, data: dict) -> int:
+        rows = [
+            (code, entry.get("discord_user_id"), get_code_status(entry), int(entry.get("timestamp", 0)), json.dumps(entry))
+            for code, entry in data.items()
+        ]
+        self.db.executemany(
+            "INSERT OR REPLACE INTO codes (code, discord_user_id, status, timestamp, entry) VALUES (?, ?, ?, ?, ?)",
+            rows
+        )
+        self.db.commit()
+        self._count()
+        self.view_dirty = True
+        return len(rows)
+
+    async def export_view(self) -> dict:
+        """The live codes in the verification_codes.json format the plugin reads"""
+        return await self._run(self._export_view)
+
+    def _export_view(self) -> dict:
+        rows = self.db.execute("SELECT code, entry FROM codes WHERE status IN ('pending', 'submitted') ORDER BY rowid")
+        return {code: json.loads(entry) for code, entry in rows}
+
+    async def refresh(self) -> bool:
+        """Apply codes the plugin verified in the JSON view since the last export"""
+        async with self.lock:
+            return await self._refresh()
+
+    async def _refresh(self) -> bool:
+        if not self.opened:
+            await self.open()
+        if not await self.fingerprint.check():
+            return False
+
+        data = await file_io.run(self.path, load_verification_codes, self.path)
+        records_changed, submitted, imported = await self._run(self._merge, data)
+        for code in imported:
+            self.allocator.reserve(code)
+        record_reload(self.path, records_changed)
+
+        if submitted and self.on_submitted:
+            self.on_submitted()
+        return True
+
+    def _merge(self, data: dict) -> tuple:
+        """Apply the file's codes, returns (records changed, newly submitted codes, imported codes)"""
+        submitted = []
+        imported = []
+        verified = 0
+        for code, disk_entry in data.items():
+            if code in self.removed:
+                continue
+            if self._insert_missing(code, disk_entry):
+                imported.append(code)
+                if get_code_status(disk_entry) == "submitted":
+                    submitted.append(code)
+                continue
+            if not disk_entry.get("verified", False):
+                continue
+            if not self._get(code).get("verified", False):
+                self._update(code, {"verified": True})
+                verified += 1
+                submitted.append(code)
+        self.db.commit()
+        return len(imported) + verified, submitted, imported
+
+    async def save(self) -> bool:
+        """Commit changes and re-export the plugin's view if live codes changed"""
+        async with self.lock:
+            try:
+                # Pick up plugin writes first so they aren't overwritten
+                await self._refresh()
+                view = await self._run(self._commit)
+            except sqlite3.Error as e:
+                log.error(f"❌ Error saving verification codes to {self.db_path}: {e}")
+                errors_total.inc(category="store")
+                return False
+
+            if view is None:
+                return True
+            # Only the live codes are exported, the JSON encoding and write happen off the loop
+            view, removed = view
+            written = await file_io.run(self.path, save_verification_codes, self.path, view, self.fingerprint.use_hash)
+            if written is None:
+                await self._run(self._restore_view, removed)
+                return False
+            self.fingerprint.record(*written)
+            return True
+
+    def _commit(self):
+        """Commit, returns the view to export and the codes removed since the last one, or None if it is unchanged"""
+        with store_io_latency.time(op="commit"):
+            self.db.commit()
+        if not self.view_dirty:
+            return None
+        self.view_dirty = False
+        removed, self.removed = self.removed, set()
+        return self._export_view(), removed
+
+    def _restore_view(self, removed: set):
+        """The export failed, keep it due and keep its removed codes from coming back"""
+        self.view_dirty = True
+        self.removed |= removed
+
+    async def close(self):
+        await self.save()
+        await self._run(self._close)
+
+    def _close(self):
+        self.db.close()
+
+# ==================== FILE WATCHING ====================
+class InotifyWatcher:
+    """Minimal inotify binding (Linux only) that calls back when a file is written"""
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+    def __init__(self, path: str, callback):
+        # Watch the directory rather than the file so replaced files (rename over) are still seen
+        self.directory = os.path.dirname(os.path.abspath(path))
+        self.filename = os.path.basename(path).encode()
+        self.callback = callback
+        self.fd = None
+        self.loop = None
+
+    def start(self, loop) -> bool:
+        """Start watching on the given event loop, returns False if inotify is unavailable"""
+        if not sys.platform.startswith("linux"):
+            return False
         try:
-            async with session.get(
-                f"https://api.mojang.com/users/profiles/minecraft/{username}",
-                timeout=10
-            ) as resp:
-                if resp.status == 200:
-                    data = await resp.json()
-                    return {"success": True, "uuid": data["id"], "name": data["name"]}
-                elif resp.status == 404:
-                    return {"success": False, "error": "Minecraft account not found"}
-                else:
-                    return {"success": False, "error": f"Mojang API error: {resp.status}"}
-        except asyncio.TimeoutError:
-            return {"success": False, "error": "Mojang API timeout"}
-        except Exception as e:
-            return {"success": False, "error": str(e)}
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+            if fd < 0:
+                raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+            wd = libc.inotify_add_watch(fd, self.directory.encode(), self.IN_CLOSE_WRITE | self.IN_MOVED_TO)
+            if wd < 0:
+                errno = ctypes.get_errno()
+                os.close(fd)
+                raise OSError(errno, f"inotify_add_watch failed for {self.directory}")
+        except (OSError, AttributeError) as e:
+            log.warning(f"⚠️ inotify unavailable: {e}")
+            return False
+
+        self.fd = fd
+        self.loop = loop
+        loop.add_reader(fd, self._on_readable)
+        return True
 
-async def check_guild_membership(uuid: str) -> dict:
-    """Check if a player is in the specified Hypixel guild"""
-    async with aiohttp.ClientSession() as session:
+    def _on_readable(self):
         try:
-            async with session.get(
-                f"https://api.hypixel.net/guild",
-                params={"key": HYPIXEL_API_KEY, "player": uuid},
-                timeout=10
-            ) as resp:
-                if resp.status == 200:
-                    data = await resp.json()
-                    
-                    if not data.get("success"):
-                        return {"success": False, "error": "Hypixel API request failed"}
-                    
-                    guild = data.get("guild")
-                    if guild is None:
-                        return {"success": False, "error": "Player is not in any guild"}
-                    
-                    # Check if it's the correct guild - HYPIXEL_GUILD_ID is a hex string (MongoDB ObjectId)
-                    if guild.get("_id") == HYPIXEL_GUILD_ID:
-                        return {"success": True, "guild_name": guild.get("name")}
-                    else:
-                        return {"success": False, "error": f"Player is in a different guild: {guild.get('name')}"}
-                else:
-                    return {"success": False, "error": f"Hypixel API error: {resp.status}"}
-        except asyncio.TimeoutError:
-            return {"success": False, "error": "Hypixel API timeout"}
-        except Exception as e:
-            return {"success": False, "error": str(e)}
+            buf = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return
+
+        header_size = self.EVENT_HEADER.size
+        offset = 0
+        matched = False
+        while offset + header_size <= len(buf):
+            _, _, _, length = self.EVENT_HEADER.unpack_from(buf, offset)
+            name = buf[offset + header_size:offset + header_size + length].rstrip(b"\0")
+            if name == self.filename:
+                matched = True
+            offset += header_size + length
 
-async def process_verified_codes():
-    """Process codes that have been set to verified: true by Minecraft plugin"""
+        if matched:
+            self.callback()
+
+    def close(self):
+        if self.fd is not None:
+            self.loop.remove_reader(self.fd)
+            os.close(self.fd)
+            self.fd = None
+
+class VerificationFileMonitor:
+    """Wakes the verification loop when the verification file changes.
+
+    Uses inotify when available so plugin writes are picked up within milliseconds,
+    otherwise polls every VERIFICATION_POLL_INTERVAL seconds. Either way the loop is
+    only woken when the file signature differs from the store's, or when the store
+    asks for it because a save merged in newly submitted codes.
+    """
+    def __init__(self, store: VerificationStore):
+        self.store = store
+        self.mode = "poll"
+        self.changed = asyncio.Event()
+        self.processing_requested = False
+        self.watcher = None
+
+    def start(self):
+        if self.watcher:
+            return
+        if VERIFICATION_WATCH_MODE in ("auto", "inotify"):
+            watcher = InotifyWatcher(self.store.path, self.changed.set)
+            if watcher.start(asyncio.get_running_loop()):
+                self.watcher = watcher
+                self.mode = "inotify"
+            elif VERIFICATION_WATCH_MODE == "inotify":
+                log.warning("⚠️ VERIFICATION_WATCH_MODE=inotify but inotify could not be started, polling instead")
+        log.info(f"👀 Watching {self.store.path} ({self.mode} mode)")
+
+    def stop(self):
+        if self.watcher:
+            self.watcher.close()
+            self.watcher = None
+
+    def request_processing(self):
+        """Wake the loop even if the file hasn't changed"""
+        self.processing_requested = True
+        self.changed.set()
+
+    def is_unchanged(self) -> bool:
+        return get_file_signature(self.store.path) == self.store.fingerprint.signature
+
+    async def wait_for_change(self):
+        """Return once the file differs from the store's copy or processing was requested"""
+        while True:
+            # In inotify mode the timeout is only a safety net for missed events, a stat is all it costs
+            try:
+                await asyncio.wait_for(self.changed.wait(), timeout=VERIFICATION_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            # Debounce: wait until writes stop arriving before reading the file
+            while self.changed.is_set():
+                self.changed.clear()
+                await asyncio.sleep(VERIFICATION_WATCH_DEBOUNCE)
+
+            if self.processing_requested or not self.is_unchanged():
+                self.processing_requested = False
+                loop_wakeups.inc(result="woken")
+                return
+            loop_wakeups.inc(result="skipped")
+
+# ==================== TENANTS ====================
+# One process can serve several Discord servers, each verifying against its own Hypixel
+# guild. Every tenant keeps its own verification file (read by the plugin of its Minecraft
+# server), store, registry and retry queue; the HTTP session, Hypixel scheduler, Mojang
+# cache, guild rosters and breakers are shared, so upstream limits hold across tenants.
+TENANT_REQUIRED_FIELDS = ("name", "discord_guild_id", "verified_role_id", "verification_file")
+
+class Tenant:
+    """A Discord server, the Hypixel guild and role it verifies with and the codes it issued"""
+    def __init__(self, config: dict):
+        self.name = config["name"]
+        self.discord_guild_id = int(config["discord_guild_id"])
+        self.hypixel_guild_id = config.get("hypixel_guild_id") or ""
+        self.verified_role_id = int(config["verified_role_id"])
+        path = config["verification_file"]
+        base = os.path.splitext(path)[0]
+        self.storage_mode = config.get("storage_mode", VERIFICATION_STORAGE_MODE).lower()
+        allocator = CodeAllocator(VERIFICATION_CODE_LENGTH, VERIFICATION_CODE_COOLDOWN)
+        if self.storage_mode == "sqlite":
+            self.store = SQLiteVerificationStore(config.get("db_path") or base + ".db", path, allocator)
+        else:
+            self.store = VerificationStore(path, self.storage_mode, config.get("journal_path") or path + ".journal", allocator)
+        self.monitor = VerificationFileMonitor(self.store)
+        self.store.on_submitted = self.monitor.request_processing
+        self.roster = get_guild_roster(self.hypixel_guild_id)
+        self.verified_members = VerifiedMembers(config.get("members_path") or base + "_members.json")
+        self.retry_queue = RetryQueue(self)
+        self.archive_path = config.get("archive_path", "")  # Append expired processed codes here (empty to drop them)
+        self.push_secret = config.get("push_secret", "")  # Secret the plugin of this tenant sends on the push channel
+        self.submission_seen_at = {}  # code -> time the bot first picked it up as submitted
+
+def load_tenant_configs() -> list:
+    """Read the tenant table from TENANTS_PATH, or describe the one server set in the environment"""
+    if not TENANTS_PATH:
+        return [{
+            "name": "default",
+            "discord_guild_id": DISCORD_GUILD_ID,
+            "hypixel_guild_id": HYPIXEL_GUILD_ID,
+            "verified_role_id": VERIFIED_ROLE_ID,
+            "verification_file": VERIFICATION_FILE_PATH,
+            "storage_mode": VERIFICATION_STORAGE_MODE,
+            "db_path": VERIFICATION_DB_PATH,
+            "journal_path": VERIFICATION_JOURNAL_PATH,
+            "members_path": VERIFIED_MEMBERS_PATH,
+            "archive_path": VERIFICATION_ARCHIVE_PATH,
+            "push_secret": PUSH_SECRET
+        }]
+    
+    with open(TENANTS_PATH, 'r', encoding='utf-8') as f:
+        configs = json.load(f)
+    if not isinstance(configs, list) or not configs:
+        raise ValueError(f"{TENANTS_PATH} must hold a non-empty JSON list of tenants")
+    for config in configs:
+        missing = [field for field in TENANT_REQUIRED_FIELDS if not config.get(field)]
+        if missing:
+            raise ValueError(f"Tenant {config.get('name', '?')} in {TENANTS_PATH} is missing {', '.join(missing)}")
+    # Tenants must not share anything they write to
+    for field in ("name", "discord_guild_id", "verification_file", "push_secret"):
+        values = [str(config[field]) for config in configs if config.get(field)]
+        if len(values) != len(set(values)):
+            raise ValueError(f"Tenants in {TENANTS_PATH} must each have their own {field}")
+    return configs
+
+tenants = {}  # Discord guild id -> Tenant, filled by load_tenants() at startup
+
+def load_tenants():
+    """Build every tenant and its store, kept out of import so tools can import the module freely"""
+    tenants.update((tenant.discord_guild_id, tenant) for tenant in map(Tenant, load_tenant_configs()))
+
+def get_tenant(interaction: discord.Interaction):
+    """The tenant of the server a command was used in, or None if that server isn't configured.
+
+    With a single tenant every interaction goes to it, as before tenants existed.
+    """
+    tenant = tenants.get(interaction.guild_id)
+    if tenant is None and len(tenants) == 1:
+        return next(iter(tenants.values()))
+    return tenant
+
+async def send_not_configured(interaction: discord.Interaction):
+    embed = discord.Embed(
+        title="❌ Server Not Configured",
+        description="Verification is not set up for this server.",
+        color=discord.Color.red()
+    )
+    await interaction.followup.send(embed=embed, ephemeral=True)
+
+def notify_upstream_recovered(upstream: str):
+    """Release the codes every tenant deferred on an upstream once its breaker closes"""
+    for tenant in tenants.values():
+        tenant.retry_queue.recovered(upstream)
+
+for breaker in breakers.values():
+    breaker.on_close = notify_upstream_recovered
+
+# ==================== PUSH CHANNEL ====================
+# The plugin can announce a submission right away instead of waiting for the bot to notice
+# the file changed. The JSON file stays the durable record: events only mark codes the bot
+# already knows as submitted, and the plugin still writes verified: true to the file.
+# The secret a plugin sends tells which tenant's store its events apply to.
+PUSH_SECRET_HEADER = "X-MSGA-Secret"
+PUSH_MAX_LINE = 4096
+
+push_runner = None
+
+async def apply_push_event(tenant, event) -> dict:
+    """Validate one event against the tenant's store and mark the code as submitted"""
+    if not isinstance(event, dict):
+        return {"accepted": False, "error": "Event must be a JSON object"}
+    code = event.get("code")
+    if event.get("event") != "code_submitted":
+        return {"code": code, "accepted": False, "error": f"Unknown event: {event.get('event')}"}
+    if not isinstance(code, str):
+        return {"code": code, "accepted": False, "error": "Missing code"}
+    
+    entry = await tenant.store.get(code)
+    if entry is None:
+        return {"code": code, "accepted": False, "error": "Unknown code"}
+    username = event.get("minecraft_username")
+    if username is not None and not isinstance(username, str):
+        return {"code": code, "accepted": False, "error": "minecraft_username must be a string"}
+    if username and username.lower() != (entry.get("minecraft_username") or "").lower():
+        return {"code": code, "accepted": False, "error": "Username does not match the code"}
+    
+    status = get_code_status(entry)
+    if status == "submitted":
+        # Already known from the file or an earlier event
+        return {"code": code, "accepted": True, "duplicate": True}
+    if status != "pending":
+        return {"code": code, "accepted": False, "error": "Code was already processed"}
+    
+    await tenant.store.update(code, verified=True)
+    tenant.submission_seen_at.setdefault(code, time.time())
+    return {"code": code, "accepted": True}
+
+async def handle_push(request):
+    """Read newline-delimited JSON events and answer with one JSON result per line"""
+    # Compared as bytes, compare_digest rejects str with non-ASCII characters
+    secret = request.headers.get(PUSH_SECRET_HEADER, "").encode()
+    # Compare against every tenant so the time taken doesn't depend on which one matched
+    matches = [
+        tenant for tenant in tenants.values()
+        if tenant.push_secret and secrets.compare_digest(secret, tenant.push_secret.encode())
+    ]
+    if not matches:
+        push_events_total.inc(result="unauthorized")
+        return web.Response(status=401, text="Invalid secret")
+    tenant = matches[0]
+    
+    results = []
+    while True:
+        try:
+            line = await request.content.readline()
+        except ValueError:
+            # Line longer than the stream's limit
+            results.append({"accepted": False, "error": "Line too long"})
+            break
+        if not line:
+            break
+        if not line.strip():
+            continue
+        if len(line) > PUSH_MAX_LINE:
+            result = {"accepted": False, "error": "Line too long"}
+        else:
+            try:
+                result = await apply_push_event(tenant, json.loads(line))
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                result = {"accepted": False, "error": "Invalid JSON"}
+        push_events_total.inc(result="accepted" if result["accepted"] else "rejected")
+        results.append(result)
+    
+    if any(result["accepted"] and not result.get("duplicate") for result in results):
+        tenant.monitor.request_processing()
+    body = "".join(json.dumps(result) + "\n" for result in results)
+    return web.Response(text=body, content_type="application/x-ndjson")
+
+async def start_push_server():
+    """Accept plugin events on a Unix socket or loopback port, on the bot's event loop"""
+    global push_runner
+    if not any(tenant.push_secret for tenant in tenants.values()):
+        log.error("❌ No push secret is set, the push channel stays disabled")
+        return
+    app = web.Application()
+    app.router.add_post("/events", handle_push)
+    push_runner = web.AppRunner(app, access_log=None)
+    await push_runner.setup()
     try:
-        data = load_verification_codes()
-        processed_any = False
-        
-        for code, entry in data.items():
-            # Check if code is verified by Minecraft plugin but not processed yet
-            if entry.get("verified", False) and not entry.get("processed", False):
-                minecraft_username = entry.get("minecraft_username")
-                discord_user_id = entry.get("discord_user_id")
-                
-                if not discord_user_id:
-                    print(f"⚠️ Code {code} has no discord_user_id, skipping")
-                    continue
-                
-                print(f"🔄 Processing verified code {code} for {minecraft_username}")
-                
-                # Get Minecraft UUID
-                uuid_result = await get_minecraft_uuid(minecraft_username)
-                if not uuid_result["success"]:
-                    print(f"❌ Failed to get UUID for {minecraft_username}: {uuid_result['error']}")
-                    # Mark as processed anyway to avoid retrying
-                    data[code]["processed"] = True
-                    data[code]["error"] = uuid_result["error"]
-                    save_verification_codes(data)
-                    continue
-                
-                uuid = uuid_result["uuid"]
-                correct_name = uuid_result["name"]
-                
-                # Check guild membership
-                guild_result = await check_guild_membership(uuid)
-                
-                # Mark as processed
-                data[code]["processed"] = True
-                
-                if not guild_result["success"]:
-                    # Not in the guild
-                    print(f"❌ Guild check failed for {correct_name}: {guild_result['error']}")
-                    data[code]["guild_verified"] = False
-                    data[code]["error"] = guild_result["error"]
-                    
-                    # Try to send DM to user
-                    try:
-                        discord_guild = bot.get_guild(DISCORD_GUILD_ID)
-                        if discord_guild:
-                            member = discord_guild.get_member(int(discord_user_id))
-                            if member:
-                                embed = discord.Embed(
-                                    title="❌ Verification Failed",
-                                    description=f"Your Minecraft account **{correct_name}** could not be verified.",
-                                    color=discord.Color.red()
-                                )
-                                embed.add_field(
-                                    name="Reason",
-                                    value=guild_result['error'],
-                                    inline=False
-                                )
-                                embed.add_field(
-                                    name="What to do",
-                                    value="1. Make sure you're in the correct Hypixel guild\n2. Try the verification process again",
-                                    inline=False
-                                )
-                                await member.send(embed=embed)
-                    except Exception as e:
-                        print(f"⚠️ Could not send DM: {e}")
-                    
-                else:
-                    # Player is in the guild - assign verified role
-                    data[code]["guild_verified"] = True
-                    data[code]["verified_at"] = datetime.now(timezone.utc).isoformat()
-                    data[code]["guild_name"] = guild_result.get("guild_name")
-                    
-                    # Get Discord guild and assign role
-                    discord_guild = bot.get_guild(DISCORD_GUILD_ID)
-                    if not discord_guild:
-                        print(f"❌ Discord guild not found (ID: {DISCORD_GUILD_ID})")
-                        data[code]["error"] = "Discord guild not found"
-                        save_verification_codes(data)
-                        continue
-                    
-                    member = discord_guild.get_member(int(discord_user_id))
-                    if not member:
-                        print(f"❌ Discord member not found (ID: {discord_user_id})")
-                        data[code]["error"] = "Discord member not found in server"
-                        save_verification_codes(data)
-                        continue
-                    
-                    role = discord_guild.get_role(VERIFIED_ROLE_ID)
-                    if not role:
-                        print(f"❌ Verified role not found (ID: {VERIFIED_ROLE_ID})")
-                        data[code]["error"] = "Verified role not found"
-                        save_verification_codes(data)
-                        continue
-                    
-                    try:
-                        if role not in member.roles:
-                            await member.add_roles(role)
-                            print(f"✅ Successfully assigned verified role to {member.name} for Minecraft account {correct_name}")
-                        else:
-                            print(f"ℹ️ {member.name} already has the verified role")
-                        
-                        # Send success DM
-                        try:
-                            embed = discord.Embed(
-                                title="✅ Verification Complete!",
-                                description=f"Your Minecraft account **{correct_name}** has been verified!",
-                                color=discord.Color.green()
-                            )
-                            embed.add_field(
-                                name="Guild Membership",
-                                value=f"You are a member of **{guild_result['guild_name']}**",
-                                inline=False
-                            )
-                            embed.add_field(
-                                name="Role Granted",
-                                value=f"You have been granted the {role.mention} role",
-                                inline=False
-                            )
-                            embed.set_footer(text=f"Verification code: {code}")
-                            await member.send(embed=embed)
-                        except Exception as e:
-                            print(f"⚠️ Could not send success DM: {e}")
-                        
-                    except discord.Forbidden:
-                        error_msg = "Bot missing permissions to add role"
-                        print(f"❌ {error_msg}")
-                        data[code]["error"] = error_msg
-                    except Exception as e:
-                        error_msg = f"Error assigning role: {str(e)}"
-                        print(f"❌ {error_msg}")
-                        data[code]["error"] = error_msg
-                
-                save_verification_codes(data)
-                processed_any = True
-        
-        return processed_any
-        
-    except Exception as e:
-        print(f"❌ Error processing verified codes: {e}")
-        return False
+        if PUSH_SOCKET_PATH:
+            site = web.UnixSite(push_runner, PUSH_SOCKET_PATH)
+            await site.start()
+            os.chmod(PUSH_SOCKET_PATH, 0o660)
+        else:
+            site = web.TCPSite(push_runner, PUSH_HOST, PUSH_PORT)
+            await site.start()
+        log.info(f"📨 Accepting plugin events at {site.name}/events")
+    except OSError as e:
+        log.error(f"❌ Could not start push channel at {PUSH_SOCKET_PATH or f'{PUSH_HOST}:{PUSH_PORT}'}: {e}")
+        await stop_push_server()
+
+async def stop_push_server():
+    global push_runner
+    if push_runner is not None:
+        await push_runner.cleanup()
+        push_runner = None
 
 # ==================== BOT EVENTS ====================
 @bot.event
 async def on_ready():
-    print(f"✅ Discord Bot logged in as {bot.user}")
-    print(f"📊 Connected to {len(bot.guilds)} guild(s)")
+    log.info(f"✅ Discord Bot logged in as {bot.user}")
+    log.info(f"📊 Connected to {len(bot.guilds)} guild(s)")
     
-    # Get the Discord guild
-    discord_guild = bot.get_guild(DISCORD_GUILD_ID)
-    if discord_guild:
-        print(f"🎯 Target Discord Guild: {discord_guild.name} (ID: {discord_guild.id})")
-        
-        # Check verified role
-        role = discord_guild.get_role(VERIFIED_ROLE_ID)
-        if role:
-            print(f"🛡️ Verified role found: {role.name}")
+    for tenant in tenants.values():
+        fields = {"tenant": tenant.name}
+        # Get the Discord guild
+        discord_guild = bot.get_guild(tenant.discord_guild_id)
+        if discord_guild:
+            log.info(f"🎯 Target Discord Guild: {discord_guild.name} (ID: {discord_guild.id})", extra=fields)
+            
+            # Check verified role
+            role = discord_guild.get_role(tenant.verified_role_id)
+            if role:
+                log.info(f"🛡️ Verified role found: {role.name}", extra=fields)
+            else:
+                log.error(f"❌ Verified role NOT found (ID: {tenant.verified_role_id})", extra=fields)
         else:
-            print(f"❌ Verified role NOT found (ID: {VERIFIED_ROLE_ID})")
-    else:
-        print(f"❌ Discord guild NOT found (ID: {DISCORD_GUILD_ID})")
-    
-    print(f"🤖 Bot is ready for verification!")
-    print(f"📁 Verification file: {VERIFICATION_FILE_PATH}")
-    print(f"🎮 Hypixel Guild ID: {HYPIXEL_GUILD_ID}")
-    print(f"🛡️ Verified Role ID: {VERIFIED_ROLE_ID}")
-    
-    # Load existing verification codes
-    data = load_verification_codes()
-    
-    # Count statuses
-    pending = sum(1 for e in data.values() if not e.get("verified", False))
-    verified = sum(1 for e in data.values() if e.get("verified", False))
-    processed = sum(1 for e in data.values() if e.get("processed", False))
-    
-    print(f"📊 Loaded {len(data)} codes: {pending} pending, {verified} verified, {processed} processed")
+            log.error(f"❌ Discord guild NOT found (ID: {tenant.discord_guild_id})", extra=fields)
+        
+        log.info(f"📁 Verification file: {tenant.store.path}", extra=fields)
+        log.info(f"🎮 Hypixel Guild ID: {tenant.hypixel_guild_id}", extra=fields)
+        log.info(f"🛡️ Verified Role ID: {tenant.verified_role_id}", extra=fields)
     
-    # Start background task
-    bot.loop.create_task(check_verified_periodically())
+    log.info(f"🤖 Bot is ready for verification in {len(tenants)} server(s)!")
+
+async def load_verification_state(tenant):
+    """Load the tenant's verification codes and log their counts, read from the status index"""
+    store = tenant.store
+    await store.refresh()
+    counts = {status: store.count(status) for status in CODE_STATUSES}
+    processed = counts["verified"] + counts["failed"]
+    verified = counts["submitted"] + counts["retrying"] + processed
+    log.info(
+        f"📊 Loaded {len(store)} codes for {tenant.name}: {counts['pending']} pending, {verified} verified, {processed} processed",
+        extra={"tenant": tenant.name}
+    )
+
+def command_tree_fingerprint() -> str:
+    """Hash of the slash command definitions, as they would be sent to Discord"""
+    commands_payload = sorted((command.to_dict(bot.tree) for command in bot.tree.get_commands()), key=lambda c: c["name"])
+    payload = json.dumps({"application_id": bot.application_id, "commands": commands_payload}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+async def sync_commands_if_changed():
+    """Sync slash commands only when their definitions changed since the last successful sync"""
+    fingerprint = command_tree_fingerprint()
+    try:
+        if (await file_io.run(COMMAND_SYNC_STATE_PATH, read_text_file, COMMAND_SYNC_STATE_PATH)).strip() == fingerprint:
+            log.info("✅ Slash commands unchanged, skipping sync")
+            return
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        log.warning(f"⚠️ Could not read {COMMAND_SYNC_STATE_PATH}: {e}")
     
-    # Sync slash commands
     try:
         synced = await bot.tree.sync()
-        print(f"✅ Synced {len(synced)} slash command(s)")
+        log.info(f"✅ Synced {len(synced)} slash command(s)")
+    except Exception as e:
+        log.error(f"❌ Error syncing commands: {e}")
+        return
+    
+    try:
+        await file_io.run(COMMAND_SYNC_STATE_PATH, write_text_file, COMMAND_SYNC_STATE_PATH, fingerprint)
     except Exception as e:
-        print(f"❌ Error syncing commands: {e}")
+        log.warning(f"⚠️ Could not write {COMMAND_SYNC_STATE_PATH}: {e}")
+
+@bot.event
+async def on_member_join(member: discord.Member):
+    """Give the role back to a verified member who rejoins the server while still in the Hypixel guild"""
+    tenant = tenants.get(member.guild.id)
+    if tenant is None:
+        return
+    # A sweep may have remembered them as not being a member
+    member_cache.pop((member.guild.id, member.id))
+    record = tenant.verified_members.members.get(str(member.id))
+    if record is None:
+        return
+    if tenant.roster.enabled:
+        in_guild = await tenant.roster.contains(record["uuid"])
+    else:
+        # With GUILD_ROSTER_REFRESH_INTERVAL=0 there is no roster, ask Hypixel about this one player
+        result = await query_player_guild(record["uuid"], tenant.hypixel_guild_id, PRIORITY_BACKGROUND)
+        in_guild = result["success"]
+    if not in_guild:
+        return
+    discord_actions.submit("sweep", tenant, None, lambda: set_verified_role(tenant, str(member.id), True))
+
+@bot.event
+async def on_app_command_completion(interaction: discord.Interaction, command):
+    duration = (discord.utils.utcnow() - interaction.created_at).total_seconds()
+    command_latency.observe(duration, command=command.name)
+    log.debug(
+        f"⌨️ /{command.name} completed in {duration:.3f}s",
+        extra={"discord_user_id": str(interaction.user.id), "stage": "command", "command": command.name, "duration": duration}
+    )
+
+async def check_verified_periodically(tenant):
+    """Process the tenant's codes set to verified: true by Minecraft whenever its file changes"""
+    await bot.wait_until_ready()
+    tenant.monitor.start()
+    try:
+        while not bot.is_closed():
+            try:
+                await tenant.store.refresh()
+                await process_verified_codes(tenant)
+            except Exception as e:
+                log.error(f"❌ Error in verification check: {e}", extra={"tenant": tenant.name})
+                errors_total.inc(category="processing")
+            await tenant.monitor.wait_for_change()
+    finally:
+        tenant.monitor.stop()
 
-async def check_verified_periodically():
-    """Periodically check for codes set to verified: true by Minecraft"""
+async def retry_deferred_codes_periodically(tenant):
+    """Send deferred codes back to processing when their backoff runs out or their upstream recovers"""
     await bot.wait_until_ready()
+    retry_queue = tenant.retry_queue
     while not bot.is_closed():
+        retry_queue.wakeup.clear()
         try:
-            await process_verified_codes()
+            next_due = await retry_queue.release_due()
         except Exception as e:
-            print(f"❌ Error in verification check: {e}")
-        await asyncio.sleep(5)  # Check every 5 seconds
+            log.error(f"❌ Error releasing deferred codes: {e}", extra={"tenant": tenant.name})
+            errors_total.inc(category="processing")
+            next_due = None
+        timeout = 60 if next_due is None else min(60, max(1, next_due - time.time()))
+        try:
+            await asyncio.wait_for(retry_queue.wakeup.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+
+async def sweep_roles_periodically(tenant):
+    """Re-check the guild membership of every member the tenant verified every ROLE_SWEEP_INTERVAL seconds"""
+    await bot.wait_until_ready()
+    while not bot.is_closed():
+        await asyncio.sleep(ROLE_SWEEP_INTERVAL)
+        try:
+            await sweep_verified_roles(tenant)
+        except Exception as e:
+            log.error(f"❌ Error in role sweep: {e}", extra={"tenant": tenant.name})
+            errors_total.inc(category="processing")
+
+async def expire_codes_periodically(tenant):
+    """Expire pending codes at their TTL and archive older codes after the retention period"""
+    await bot.wait_until_ready()
+    store = tenant.store
+    while not bot.is_closed():
+        next_deadline = None
+        try:
+            expired = await store.expire(time.time())
+            if expired:
+                archived = [
+                    dict(entry, code=code, archived_at=datetime.now(timezone.utc).isoformat())
+                    for code, entry in expired if get_code_status(entry) != "pending"
+                ]
+                if archived and tenant.archive_path:
+                    await file_io.run(tenant.archive_path, append_archive, tenant.archive_path, archived)
+                await store.save()
+                log.info(
+                    f"🧹 Expired {len(expired) - len(archived)} pending code(s) and retired {len(archived)} processed code(s)",
+                    extra={"tenant": tenant.name}
+                )
+            next_deadline = await store.next_deadline()
+        except Exception as e:
+            log.error(f"❌ Error expiring codes: {e}", extra={"tenant": tenant.name})
+        
+        # Wake at the next deadline, but at least once a minute so new codes are picked up
+        delay = 60 if next_deadline is None else next_deadline - time.time()
+        await asyncio.sleep(min(max(delay, 1), 60))
 
 # ==================== SLASH COMMANDS ====================
 @bot.tree.command(name="verify", description="Start verification process with your Minecraft username")
@@ -317,53 +3355,64 @@ async def verify_command(interaction: discord.Interaction, minecraft_username: s
     """Start verification process - generates code and saves with verified: false"""
     
     await interaction.response.defer(ephemeral=True)
+    tenant = get_tenant(interaction)
+    if tenant is None:
+        await send_not_configured(interaction)
+        return
+    store = tenant.store
     
     # Clean username
     minecraft_username = minecraft_username.strip()
     
-    # Load existing data
-    data = load_verification_codes()
-    
     # Check if user already has an active verification (not processed)
     user_id = str(interaction.user.id)
-    for code, entry in data.items():
-        if entry.get("discord_user_id") == user_id and not entry.get("processed", False):
-            if entry.get("verified", False):
-                status = "Submitted in Minecraft - waiting for processing"
-            else:
-                status = "Pending - not submitted in Minecraft yet"
-            
-            embed = discord.Embed(
-                title="⚠️ Active Verification Found",
-                description=f"You already have an active verification!",
-                color=discord.Color.orange()
-            )
-            embed.add_field(name="Minecraft Account", value=entry.get("minecraft_username"), inline=False)
-            embed.add_field(name="Verification Code", value=f"`{code}`", inline=False)
-            embed.add_field(name="Status", value=status, inline=False)
-            embed.add_field(
-                name="Instructions",
-                value=f"Join the Minecraft server and type:\n```/verify {code}```",
-                inline=False
-            )
-            await interaction.followup.send(embed=embed, ephemeral=True)
-            return
+    code = await store.active_code_for_user(user_id)
+    if code is not None:
+        entry = await store.get(code)
+        if entry.get("verified", False):
+            status = "Submitted in Minecraft - waiting for processing"
+        else:
+            status = "Pending - not submitted in Minecraft yet"
+        
+        embed = discord.Embed(
+            title="⚠️ Active Verification Found",
+            description=f"You already have an active verification!",
+            color=discord.Color.orange()
+        )
+        embed.add_field(name="Minecraft Account", value=entry.get("minecraft_username"), inline=False)
+        embed.add_field(name="Verification Code", value=f"`{code}`", inline=False)
+        embed.add_field(name="Status", value=status, inline=False)
+        embed.add_field(
+            name="Instructions",
+            value=f"Join the Minecraft server and type:\n```/verify {code}```",
+            inline=False
+        )
+        await interaction.followup.send(embed=embed, ephemeral=True)
+        return
     
     # Generate new code
-    code = generate_code()
+    code = generate_code(tenant)
+    if code is None:
+        embed = discord.Embed(
+            title="❌ No Codes Available",
+            description="All verification codes are currently in use. Please try again later.",
+            color=discord.Color.red()
+        )
+        await interaction.followup.send(embed=embed, ephemeral=True)
+        return
     timestamp = int(datetime.now(timezone.utc).timestamp())
     
     # Save to JSON with verified: false
-    data[code] = {
+    await store.add(code, {
         "minecraft_username": minecraft_username,
         "timestamp": timestamp,
         "verified": False,  # Minecraft plugin will set this to true
         "discord_user_id": user_id,
         "processed": False,  # Bot will set this to true after processing
         "created_at": datetime.now(timezone.utc).isoformat()
-    }
+    })
     
-    save_verification_codes(data)
+    await store.save()
     
     # Send instructions to user
     embed = discord.Embed(
@@ -397,35 +3446,45 @@ async def verify_command(interaction: discord.Interaction, minecraft_username: s
         inline=False
     )
     embed.add_field(
-        name="⏱️ **Code expires in 30 minutes**",
-        value="If you don't submit the code within 30 minutes, you'll need to start over",
+        name=f"⏱️ **Code expires in {VERIFICATION_CODE_TTL // 60} minutes**",
+        value=f"If you don't submit the code within {VERIFICATION_CODE_TTL // 60} minutes, you'll need to start over",
         inline=False
     )
     
     await interaction.followup.send(embed=embed, ephemeral=True)
-    print(f"📝 Generated code {code} for {minecraft_username} (Discord: {interaction.user.name})")
+    log.info(
+        f"📝 Generated code {code} for {minecraft_username} (Discord: {interaction.user.name})",
+        extra={"code": code, "tenant": tenant.name, "discord_user_id": user_id, "minecraft_username": minecraft_username, "stage": "command"}
+    )
 
 @bot.tree.command(name="status", description="Check your verification status")
 async def status_command(interaction: discord.Interaction):
     """Check verification status"""
     await interaction.response.defer(ephemeral=True)
+    tenant = get_tenant(interaction)
+    if tenant is None:
+        await send_not_configured(interaction)
+        return
     
     user_id = str(interaction.user.id)
-    data = load_verification_codes()
     
     # Find user's codes
-    user_codes = []
-    for code, entry in data.items():
-        if entry.get("discord_user_id") == user_id:
-            user_codes.append((code, entry))
+    user_codes = await tenant.store.codes_for_user(user_id)
     
     if not user_codes:
         # Check if user already has verified role
-        discord_guild = bot.get_guild(DISCORD_GUILD_ID)
+        discord_guild = bot.get_guild(tenant.discord_guild_id)
         if discord_guild:
-            member = discord_guild.get_member(interaction.user.id)
+            # Commands used in the server already carry the member with its roles
+            if isinstance(interaction.user, discord.Member) and interaction.user.guild.id == tenant.discord_guild_id:
+                member = interaction.user
+            else:
+                try:
+                    member = await get_guild_member(discord_guild, interaction.user.id)
+                except Exception:
+                    member = None
             if member:
-                role = discord_guild.get_role(VERIFIED_ROLE_ID)
+                role = discord_guild.get_role(tenant.verified_role_id)
                 if role and role in member.roles:
                     embed = discord.Embed(
                         title="✅ Already Verified",
@@ -444,7 +3503,8 @@ async def status_command(interaction: discord.Interaction):
         return
     
     # Show most recent code
-    code, entry = user_codes[-1]  # Most recent
+    code = user_codes[-1]  # Most recent
+    entry = await tenant.store.get(code)
     minecraft_username = entry.get("minecraft_username")
     verified = entry.get("verified", False)
     processed = entry.get("processed", False)
@@ -470,7 +3530,14 @@ async def status_command(interaction: discord.Interaction):
             description=f"Code submitted for **{minecraft_username}**!",
             color=discord.Color.blue()
         )
-        embed.add_field(name="Status", value="Checking guild membership...", inline=False)
+        if entry.get("retry_at"):
+            embed.add_field(
+                name="Status",
+                value=f"Mojang or Hypixel is unavailable right now, retrying automatically <t:{entry['retry_at']}:R>.",
+                inline=False
+            )
+        else:
+            embed.add_field(name="Status", value="Checking guild membership...", inline=False)
         embed.add_field(name="Code", value=f"`{code}`", inline=False)
     elif processed:
         if guild_verified:
@@ -499,95 +3566,135 @@ async def status_command(interaction: discord.Interaction):
     
     await interaction.followup.send(embed=embed, ephemeral=True)
 
+CODE_LIST_STYLES = {
+    "pending": ("📝 Pending Codes (not submitted in Minecraft)", discord.Color.orange()),
+    "submitted": ("🔄 Submitted Codes (waiting for processing)", discord.Color.blue()),
+    "retrying": ("⏳ Retrying Codes (Mojang or Hypixel unavailable)", discord.Color.gold()),
+    "verified": ("✅ Verified Codes", discord.Color.green()),
+    "failed": ("❌ Failed Verifications", discord.Color.red()),
+    "all": ("📋 Verification Codes", discord.Color.blurple())
+}
+
+class CodeListView(discord.ui.View):
+    """Paginated list of a tenant's verification codes, filtered by status and optionally by user.
+
+    Only the codes on the current page are loaded and only their members are resolved.
+    """
+    def __init__(self, tenant, status: str, user_id: str = None):
+        super().__init__(timeout=300)
+        self.tenant = tenant
+        self.status = status
+        self.user_id = user_id
+        self.page = 0
+        for option in self.status_select.options:
+            option.default = option.value == status
+        if user_id is None:
+            self.status_select.options = [o for o in self.status_select.options if o.value != "all"]
+
+    async def _user_codes(self) -> list:
+        store = self.tenant.store
+        codes = await store.codes_for_user(self.user_id)
+        if self.status == "all":
+            return codes
+        return [code for code in codes if get_code_status(await store.get(code)) == self.status]
+
+    async def _page_codes(self) -> tuple:
+        """Codes on the current page and the total number of matching codes"""
+        offset = self.page * LIST_CODES_PAGE_SIZE
+        if self.user_id is not None:
+            codes = await self._user_codes()
+            return codes[offset:offset + LIST_CODES_PAGE_SIZE], len(codes)
+        total = self.tenant.store.count(self.status)
+        return await self.tenant.store.codes_with_status(self.status, limit=LIST_CODES_PAGE_SIZE, offset=offset), total
+
+    async def render(self) -> discord.Embed:
+        codes, total = await self._page_codes()
+        pages = max(1, -(-total // LIST_CODES_PAGE_SIZE))
+        if self.page >= pages:
+            self.page = pages - 1
+            codes, total = await self._page_codes()
+
+        entries = [(code, await self.tenant.store.get(code)) for code in codes]
+        names = await resolve_member_names(self.tenant, {entry.get("discord_user_id", "") for _, entry in entries})
+
+        lines = []
+        for code, entry in entries:
+            discord_user_id = entry.get("discord_user_id", "None")
+            discord_name = names.get(discord_user_id) or "Unknown"
+            line = f"**{code}**: {entry.get('minecraft_username', 'Unknown')}\nDiscord: {discord_name} ({discord_user_id})"
+            if self.status == "all":
+                line += f" • {get_code_status(entry)}"
+            lines.append(line)
+
+        title, color = CODE_LIST_STYLES[self.status]
+        embed = discord.Embed(title=title, description="\n".join(lines) or "No codes found.", color=color)
+        if self.user_id is not None:
+            embed.add_field(name="User", value=f"<@{self.user_id}>", inline=False)
+        embed.add_field(
+            name="Totals",
+            value=", ".join(f"{self.tenant.store.count(status)} {status}" for status in CODE_STATUSES),
+            inline=False
+        )
+        embed.set_footer(text=f"Page {self.page + 1}/{pages} • Total: {total}")
+
+        self.previous_page.disabled = self.page == 0
+        self.next_page.disabled = self.page >= pages - 1
+        return embed
+
+    async def show(self, interaction: discord.Interaction):
+        await interaction.response.edit_message(embed=await self.render(), view=self)
+
+    @discord.ui.button(label="Previous", emoji="◀️", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page = max(0, self.page - 1)
+        await self.show(interaction)
+
+    @discord.ui.button(label="Next", emoji="▶️", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page += 1
+        await self.show(interaction)
+
+    @discord.ui.select(placeholder="Filter by status", options=[
+        discord.SelectOption(label="Pending", value="pending", emoji="📝"),
+        discord.SelectOption(label="Submitted", value="submitted", emoji="🔄"),
+        discord.SelectOption(label="Retrying", value="retrying", emoji="⏳"),
+        discord.SelectOption(label="Verified", value="verified", emoji="✅"),
+        discord.SelectOption(label="Failed", value="failed", emoji="❌"),
+        discord.SelectOption(label="All", value="all", emoji="📋")
+    ])
+    async def status_select(self, interaction: discord.Interaction, select: discord.ui.Select):
+        self.status = select.values[0]
+        self.page = 0
+        for option in select.options:
+            option.default = option.value == self.status
+        await self.show(interaction)
+
 @bot.tree.command(name="list_codes", description="List all verification codes (Admin only)")
 @app_commands.default_permissions(administrator=True)
-async def list_codes_command(interaction: discord.Interaction):
-    """List all verification codes"""
+@app_commands.describe(status="Only show codes with this status", user="Only show codes of this Discord user")
+@app_commands.choices(status=[
+    app_commands.Choice(name="Pending", value="pending"),
+    app_commands.Choice(name="Submitted", value="submitted"),
+    app_commands.Choice(name="Retrying", value="retrying"),
+    app_commands.Choice(name="Verified", value="verified"),
+    app_commands.Choice(name="Failed", value="failed")
+])
+async def list_codes_command(interaction: discord.Interaction, status: str = None, user: discord.User = None):
+    """List verification codes one page at a time"""
     await interaction.response.defer(ephemeral=True)
+    tenant = get_tenant(interaction)
+    if tenant is None:
+        await send_not_configured(interaction)
+        return
     
     try:
-        data = load_verification_codes()
-        
-        if not data:
+        if not len(tenant.store):
             await interaction.followup.send("No verification codes found.", ephemeral=True)
             return
         
-        # Create embeds for different statuses
-        pending_codes = []
-        submitted_codes = []
-        processed_codes = []
-        failed_codes = []
-        
-        for code, entry in data.items():
-            minecraft_username = entry.get("minecraft_username", "Unknown")
-            verified = entry.get("verified", False)
-            processed = entry.get("processed", False)
-            guild_verified = entry.get("guild_verified", None)
-            discord_user_id = entry.get("discord_user_id", "None")
-            
-            # Try to get Discord username
-            discord_name = "Unknown"
-            try:
-                discord_guild = bot.get_guild(DISCORD_GUILD_ID)
-                if discord_guild:
-                    member = discord_guild.get_member(int(discord_user_id)) if discord_user_id.isdigit() else None
-                    if member:
-                        discord_name = member.name
-            except:
-                pass
-            
-            entry_info = f"**{code}**: {minecraft_username}\nDiscord: {discord_name} ({discord_user_id})"
-            
-            if not verified:
-                pending_codes.append(entry_info)
-            elif verified and not processed:
-                submitted_codes.append(entry_info)
-            elif processed and guild_verified:
-                processed_codes.append(entry_info)
-            elif processed and not guild_verified:
-                failed_codes.append(entry_info)
-        
-        embeds = []
-        
-        if pending_codes:
-            embed = discord.Embed(
-                title="📝 Pending Codes (not submitted in Minecraft)",
-                description="\n".join(pending_codes[:10]),  # Limit to 10
-                color=discord.Color.orange()
-            )
-            embed.set_footer(text=f"Total: {len(pending_codes)}")
-            embeds.append(embed)
-        
-        if submitted_codes:
-            embed = discord.Embed(
-                title="🔄 Submitted Codes (waiting for processing)",
-                description="\n".join(submitted_codes[:10]),
-                color=discord.Color.blue()
-            )
-            embed.set_footer(text=f"Total: {len(submitted_codes)}")
-            embeds.append(embed)
-        
-        if processed_codes:
-            embed = discord.Embed(
-                title="✅ Verified Codes",
-                description="\n".join(processed_codes[:10]),
-                color=discord.Color.green()
-            )
-            embed.set_footer(text=f"Total: {len(processed_codes)}")
-            embeds.append(embed)
-        
-        if failed_codes:
-            embed = discord.Embed(
-                title="❌ Failed Verifications",
-                description="\n".join(failed_codes[:10]),
-                color=discord.Color.red()
-            )
-            embed.set_footer(text=f"Total: {len(failed_codes)}")
-            embeds.append(embed)
-        
-        # Send embeds
-        for embed in embeds:
-            await interaction.followup.send(embed=embed, ephemeral=True)
+        user_id = str(user.id) if user else None
+        view = CodeListView(tenant, status or ("all" if user_id else "pending"), user_id)
+        await interaction.followup.send(embed=await view.render(), view=view, ephemeral=True)
             
     except Exception as e:
         await interaction.followup.send(f"❌ Error: {str(e)}", ephemeral=True)
@@ -597,34 +3704,30 @@ async def list_codes_command(interaction: discord.Interaction):
 async def cleanup_command(interaction: discord.Interaction):
     """Remove old verification codes"""
     await interaction.response.defer(ephemeral=True)
+    tenant = get_tenant(interaction)
+    if tenant is None:
+        await send_not_configured(interaction)
+        return
+    store = tenant.store
     
     try:
-        data = load_verification_codes()
-        old_count = len(data)
+        old_count = len(store)
         
         # Remove codes older than 24 hours
         current_time = datetime.now(timezone.utc).timestamp()
-        codes_to_remove = []
-        
-        for code, entry in data.items():
-            timestamp = entry.get("timestamp", 0)
-            if current_time - timestamp > 86400:  # 24 hours
-                codes_to_remove.append(code)
+        removed = await store.remove_older_than(current_time - 86400)
         
-        for code in codes_to_remove:
-            data.pop(code, None)
-        
-        if codes_to_remove:
-            save_verification_codes(data)
+        if removed:
+            await store.save()
         
         embed = discord.Embed(
             title="🧹 Cleanup Complete",
-            description=f"Removed {len(codes_to_remove)} old verification codes.",
+            description=f"Removed {removed} old verification codes.",
             color=discord.Color.green()
         )
         embed.add_field(name="Before", value=old_count, inline=True)
-        embed.add_field(name="After", value=len(data), inline=True)
-        embed.add_field(name="Removed", value=len(codes_to_remove), inline=True)
+        embed.add_field(name="After", value=len(store), inline=True)
+        embed.add_field(name="Removed", value=removed, inline=True)
         
         await interaction.followup.send(embed=embed, ephemeral=True)
         
@@ -633,20 +3736,23 @@ async def cleanup_command(interaction: discord.Interaction):
 
 # ==================== MAIN ENTRY POINT ====================
 if __name__ == "__main__":
-    print("🚀 Starting Discord Verification Bot...")
-    print("=" * 50)
-    print(f"📁 Verification file: {VERIFICATION_FILE_PATH}")
-    print(f"🎮 Hypixel Guild ID: {HYPIXEL_GUILD_ID}")
-    print(f"💬 Discord Guild ID: {DISCORD_GUILD_ID}")
-    print(f"🛡️ Verified Role ID: {VERIFIED_ROLE_ID}")
-    
-    # Check if verification file exists
-    if os.path.exists(VERIFICATION_FILE_PATH):
-        print("✅ Verification file found")
-    else:
-        print("⚠️ Verification file not found. It will be created when first code is generated.")
+    setup_logging()
+    log.info("🚀 Starting Discord Verification Bot...")
+    load_tenants()
+    for tenant in tenants.values():
+        fields = {"tenant": tenant.name}
+        log.info(f"📁 Verification file: {tenant.store.path}", extra=fields)
+        log.info(f"🎮 Hypixel Guild ID: {tenant.hypixel_guild_id}", extra=fields)
+        log.info(f"💬 Discord Guild ID: {tenant.discord_guild_id}", extra=fields)
+        log.info(f"🛡️ Verified Role ID: {tenant.verified_role_id}", extra=fields)
+        
+        # Check if verification file exists
+        if os.path.exists(tenant.store.path):
+            log.info("✅ Verification file found", extra=fields)
+        else:
+            log.warning("⚠️ Verification file not found. It will be created when first code is generated.", extra=fields)
     
-    print("=" * 50)
-    print("🤖 Starting bot...")
+    log.info("🤖 Starting bot...")
     
-    bot.run(DISCORD_TOKEN)
\ No newline at end of file
+    # discord.py's records go through the same log thread as the bot's
+    bot.run(DISCORD_TOKEN, log_handler=None)
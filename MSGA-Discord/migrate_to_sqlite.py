@@ -0,0 +1,49 @@
+"""One-shot migration of verification_codes.json into the SQLite store.
+
+Import the JSON file (run once, with the bot stopped):
+    python migrate_to_sqlite.py --json /root/verification_codes.json --db /root/verification_codes.db
+
+Export the live codes back to the JSON format the plugin reads:
+    python migrate_to_sqlite.py --db /root/verification_codes.db --export /root/verification_codes.json
+
+Then start the bot with VERIFICATION_STORAGE_MODE=sqlite.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from bot import SQLiteVerificationStore, VERIFICATION_DB_PATH, VERIFICATION_FILE_PATH, file_io
+
+async def migrate(args):
+    # The store runs its queries on its own I/O thread, like in the bot
+    store = SQLiteVerificationStore(args.db, args.export or args.json)
+    await store.open()
+
+    if args.export:
+        view = await store.export_view()
+        with open(args.export, 'w', encoding='utf-8') as f:
+            json.dump(view, f, indent=2)
+        print(f"✅ Exported {len(view)} live codes from {args.db} to {args.export}")
+    else:
+        with open(args.json, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        start = time.perf_counter()
+        imported = await store.import_codes(data)
+        elapsed = time.perf_counter() - start
+        print(f"✅ Imported {imported} codes from {args.json} into {args.db} in {elapsed:.2f}s")
+        print("📊 " + ", ".join(f"{store.count(status)} {status}" for status in ("pending", "submitted", "verified", "failed")))
+
+    file_io.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate verification codes between JSON and SQLite")
+    parser.add_argument("--json", default=VERIFICATION_FILE_PATH, help="verification_codes.json to import")
+    parser.add_argument("--db", default=VERIFICATION_DB_PATH, help="SQLite database to import into")
+    parser.add_argument("--export", metavar="PATH", help="Export the live codes to PATH instead of importing")
+    args = parser.parse_args()
+    asyncio.run(migrate(args))
+
+if __name__ == "__main__":
+    main()
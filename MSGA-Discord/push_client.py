@@ -0,0 +1,58 @@
+"""Local test client for the bot's push channel.
+
+Announce submitted codes the way the plugin would (the bot must run with PUSH_SECRET and
+PUSH_PORT or PUSH_SOCKET_PATH set, this script reads the same .env):
+    python push_client.py 123456 654321
+    python push_client.py 123456 --username Notch
+
+Each code is sent as one "code_submitted" line in a single request, and the bot's
+answer for each line is printed.
+"""
+import argparse
+import asyncio
+import json
+
+import aiohttp
+
+from bot import PUSH_HOST, PUSH_PORT, PUSH_SECRET, PUSH_SECRET_HEADER, PUSH_SOCKET_PATH
+
+async def send_events(args) -> list:
+    events = [{"event": "code_submitted", "code": code} for code in args.codes]
+    if args.username:
+        for event in events:
+            event["minecraft_username"] = args.username
+    body = "".join(json.dumps(event) + "\n" for event in events)
+
+    if args.socket:
+        connector = aiohttp.UnixConnector(path=args.socket)
+        url = "http://localhost/events"
+    else:
+        connector = aiohttp.TCPConnector()
+        url = f"http://{args.host}:{args.port}/events"
+    async with aiohttp.ClientSession(connector=connector) as session:
+        async with session.post(url, data=body, headers={PUSH_SECRET_HEADER: args.secret}) as response:
+            text = await response.text()
+            if response.status != 200:
+                raise SystemExit(f"❌ {response.status}: {text}")
+            return [json.loads(line) for line in text.splitlines()]
+
+def main():
+    parser = argparse.ArgumentParser(description="Send code_submitted events to the bot's push channel")
+    parser.add_argument("codes", nargs="+", help="Codes to announce")
+    parser.add_argument("--username", help="Minecraft username that entered the codes")
+    parser.add_argument("--socket", default=PUSH_SOCKET_PATH, help="Unix socket of the push channel")
+    parser.add_argument("--host", default=PUSH_HOST)
+    parser.add_argument("--port", type=int, default=PUSH_PORT)
+    parser.add_argument("--secret", default=PUSH_SECRET, help="Push secret of the tenant the codes belong to")
+    args = parser.parse_args()
+    if not args.socket and not args.port:
+        parser.error("set PUSH_SOCKET_PATH or PUSH_PORT, or pass --socket or --port")
+
+    for result in asyncio.run(send_events(args)):
+        if result["accepted"]:
+            print(f"✅ {result['code']}: {'already submitted' if result.get('duplicate') else 'accepted'}")
+        else:
+            print(f"❌ {result.get('code')}: {result['error']}")
+
+if __name__ == "__main__":
+    main()